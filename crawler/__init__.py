@@ -1,4 +1,5 @@
 from utils import get_logger
+from utils.download import log_transport_stats
 from crawler.frontier import Frontier
 from crawler.worker import Worker
 
@@ -35,7 +36,11 @@ class Crawler(object):
         self.start_async()
         self.join()
 
-    # waits for all workers to finish
+    # waits for all workers to finish, then flushes whatever the frontier still buffers
     def join(self):
-        for worker in self.workers:
-            worker.join()
+        try:
+            for worker in self.workers:
+                worker.join()
+        finally:
+            self.frontier.close()
+            log_transport_stats(self.logger)
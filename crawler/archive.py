@@ -0,0 +1,125 @@
+import os
+import gzip
+import time
+import struct
+from threading import Lock
+
+import cbor
+
+from utils.response import Response
+
+'''
+archive of every response the crawler fetched, so changes to scraper.py can be
+tried on a real crawl without downloading it again (python3 replay.py). it is
+laid out like a WARC file
+    <ARCHIVE>/00000000.arc.gz  -> segments of up to ARCHIVESEGMENT MB, one gzip
+                                  member per response, so a record can be read
+                                  from its offset without the rest of the file
+    <ARCHIVE>/index.tsv        -> segment, offset and length of every record,
+                                  tab separated, followed by its url
+a record is a 4 byte length and the cbor encoded
+    {"url": url asked for, "time": fetch time, "response": Response.to_dict()}
+which is the same dict the cache server sends, so replay builds the Response
+exactly like download does. a resumed crawl keeps appending in a new segment
+'''
+
+LENGTH = struct.Struct(">I")
+
+
+def _segment_path(directory, segment):
+    return os.path.join(directory, f"{segment:08d}.arc.gz")
+
+
+def _segments(directory):
+    return sorted(
+        int(name[:-len(".arc.gz")]) for name in os.listdir(directory)
+        if name.endswith(".arc.gz"))
+
+
+def encode_record(url, resp):
+    payload = cbor.dumps({"url": url, "time": time.time(), "response": resp.to_dict()})
+    return LENGTH.pack(len(payload)) + payload
+
+
+# (url asked for, Response) of a record
+def decode_record(payload):
+    record = cbor.loads(payload)
+    return record["url"], Response(record["response"])
+
+
+class ResponseArchive(object):
+    def __init__(self, directory, segment_size):
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(self.directory, exist_ok=True)
+        segments = _segments(self.directory)
+        self.segment = segments[-1] + 1 if segments else 0
+        self.lock = Lock()
+        self.file = open(_segment_path(self.directory, self.segment), "ab")
+        self.index = open(os.path.join(self.directory, "index.tsv"), "a", encoding="utf-8")
+
+    def append(self, url, resp):
+        # compressed outside the lock, only the write is serialized
+        member = gzip.compress(encode_record(url, resp), compresslevel=6)
+        with self.lock:
+            offset = self.file.tell()
+            self.file.write(member)
+            self.index.write(f"{self.segment}\t{offset}\t{len(member)}\t{url}\n")
+            if offset + len(member) >= self.segment_size:
+                self._next_segment()
+
+    def _next_segment(self):
+        self.file.close()
+        self.index.flush()
+        self.segment += 1
+        self.file = open(_segment_path(self.directory, self.segment), "ab")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+            self.index.close()
+
+
+class ArchiveReader(object):
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = None
+
+    # raw record payloads in fetch order, decode them with decode_record
+    def payloads(self):
+        for segment in _segments(self.directory):
+            with gzip.open(_segment_path(self.directory, segment), "rb") as f:
+                while True:
+                    try:
+                        header = f.read(LENGTH.size)
+                        if len(header) < LENGTH.size:
+                            break
+                        payload = f.read(LENGTH.unpack(header)[0])
+                    except EOFError:
+                        # the crawl was killed halfway through writing this record
+                        break
+                    yield payload
+
+    def __iter__(self):
+        for payload in self.payloads():
+            yield decode_record(payload)
+
+    def _load_index(self):
+        self.index = dict()
+        with open(os.path.join(self.directory, "index.tsv"), encoding="utf-8") as f:
+            for line in f:
+                segment, offset, length, url = line.rstrip("\n").split("\t", 3)
+                # a url fetched twice keeps its latest response
+                self.index[url] = (int(segment), int(offset), int(length))
+
+    # latest archived Response of a url, None when it was never fetched
+    def get(self, url):
+        if self.index is None:
+            self._load_index()
+        if url not in self.index:
+            return None
+        segment, offset, length = self.index[url]
+        with open(_segment_path(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        return decode_record(data[LENGTH.size:])[1]
@@ -0,0 +1,107 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from utils import get_logger
+from utils.download import download_async, log_transport_stats
+from crawler.frontier import Frontier
+import scraper
+
+'''
+asyncio alternative to the thread per worker Crawler (python3 launch.py --engine asyncio)
+    one event loop keeps up to MAXINFLIGHT downloads going at the same time
+    through a single aiohttp session, while the scraper runs in a small thread
+    pool so parsing a page never blocks the other downloads. the frontier and
+    the scraper(url, resp) contract are the same as with the threaded workers
+'''
+class AsyncCrawler(object):
+    def __init__(self, config, restart, frontier_factory=Frontier):
+        self.config = config
+        self.logger = get_logger("CRAWLER")
+        self.frontier = frontier_factory(config, restart)
+
+    def start(self):
+        try:
+            asyncio.run(self._crawl())
+        finally:
+            self.frontier.close()
+            log_transport_stats(self.logger)
+
+    async def _crawl(self):
+        # bounds the number of downloads in flight
+        self.slots = asyncio.Semaphore(self.config.max_in_flight)
+        # set whenever a page is done, since that may add urls or end the crawl
+        self.changed = asyncio.Event()
+        self.tasks = set()
+        self.executor = ThreadPoolExecutor(max_workers=self.config.threads_count)
+        connector = aiohttp.TCPConnector(limit=self.config.max_in_flight)
+        # the per download DEADLINE is enforced by download_async
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self.config.connect_timeout, sock_read=self.config.read_timeout)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                while True:
+                    await self.slots.acquire()
+                    url = await self._next_url()
+                    if url is None:
+                        self.slots.release()
+                        break
+                    task = asyncio.create_task(self._process(session, url))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+                await asyncio.gather(*self.tasks)
+        finally:
+            self.executor.shutdown()
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    # waits without blocking the loop until the frontier has a url off cooldown,
+    # returns None once nothing is queued and no page is still being processed
+    async def _next_url(self):
+        while True:
+            self.changed.clear()
+            url, wait = self.frontier.poll_tbd_url()
+            if url is not None:
+                return url
+            if wait is None and self.frontier.in_flight == 0:
+                return None
+            try:
+                await asyncio.wait_for(self.changed.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, session, url):
+        # True once the url went back to the frontier instead of being completed
+        requeued = False
+        history = self.frontier.history
+        try:
+            fresh_links = history.fresh_links(url)
+            if fresh_links is not None:
+                self.frontier.add_urls(fresh_links, parent=url)
+                return
+            resp = await download_async(
+                url, self.config, session, self.logger, history.validators(url))
+            self.logger.info(
+                f"Downloaded {url}, status <{resp.status}>, "
+                f"using cache {self.config.cache_server}.")
+            if resp.retry_after is not None:
+                requeued = self.frontier.retry_url(url, resp.retry_after)
+                if requeued:
+                    self.logger.warning(f"Retrying {url} in {resp.retry_after:.1f}s.")
+                    return
+            if resp.host_dead:
+                self.frontier.park_url(url)
+                requeued = True
+                return
+            if self.frontier.archive is not None:
+                self.frontier.archive.append(url, resp)
+            scraped_urls = await asyncio.get_running_loop().run_in_executor(
+                self.executor, history.scrape, url, resp, scraper.scraper)
+            self.frontier.add_urls(scraped_urls, parent=url, resp=resp)
+        except Exception as e:
+            self.logger.error(f"Failed to process {url}: {e}")
+        finally:
+            if not requeued:
+                self.frontier.mark_url_complete(url)
+            self.slots.release()
+            self.changed.set()
@@ -1,35 +1,125 @@
-import os
-import shelve
+import time
+import heapq
+import hashlib
+import itertools
 
-from threading import Thread, RLock
-from queue import Queue, Empty
+from inspect import getsource
+from threading import Thread, RLock, Condition, Event
+from urllib.parse import urlparse
 
-from utils import get_logger, get_urlhash, normalize
+from utils import get_logger, get_urlhash
+from utils.canonical import canonicalize
 from scraper import is_valid
+from crawler.storage import STORES
+from crawler.seen import SEEN_INDEXES
+from crawler.scoring import SCORERS
+from crawler.spill import SegmentedQueue
+from crawler.recrawl import PageHistory
+from crawler.archive import ResponseArchive
+from crawler.traps import TrapDetector
+from scraper_utils.content_type import classify, HTML
+from scraper_utils import url_filter
 '''
 purpose of frontier class: manages the list of URLS to be downloaded and keeps track of the crawlers progress. ensuring that
 1) urls are not downloaded multiple times 2) progress is saved so the crawler can resume if interrupted
 '''
+
+# version of the is_valid rules, the save file keeps the one its cached results come from
+def rules_version():
+    source = getsource(is_valid) + getsource(url_filter)
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
 class Frontier(object):
     # loads the list of URLS to save from the file or starts with seed URLs
     # deletes the save file if restarting from scratch
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
+        # politeness is per host: every host has its own heap of
+        # (score, seq, url, depth, checked) entries, checked is False for resumed
+        # urls that still need their deferred is_valid check. a host with pending urls sits either
+        # in the cooling heap as (next allowed fetch time, host) or, once off
+        # cooldown, in the ready heap as (score of its best url, seq, host).
+        # while one of its urls is downloading it is in neither, and its
+        # cooldown only starts once that download is over (see _release)
+        self.host_queues = dict()
+        self.cooling = list()
+        self.ready = list()
+        self.scheduled = set()
+        self.next_fetch_time = dict()
+        self.host_fetched = dict()
+        self.counter = itertools.count()
+        # url -> its live entry, for every url queued in memory. other entries
+        # for the same url are stale (its score changed) and get skipped
+        self.queued = dict()
+        # number of stale entries left in the host heaps, they are compacted
+        # away once there are more of them than live ones
+        self.stale = 0
+        self.inlinks = dict()
+        # depth of the urls handed out, so their links get depth + 1
+        self.depth_of = dict()
+        # url handed out -> its host, a host has at most one url downloading
+        self.fetching = dict()
+        # url -> failed downloads so far, see retry_url
+        self.retries = dict()
+        # hosts that stopped responding, see park_url
+        self.parked = set()
+        self.scorers = [SCORERS[name] for name in self.config.scorers]
+        # low priority entries past MAXQUEUED wait on disk
+        self.spill = SegmentedQueue(
+            self.config.save_file + ".spill", self.config.spill_segment)
+        # write-behind buffer of urlhash -> (url, completed) not yet in the store
+        self.unsaved = dict()
+        self.closed = Event()
+        # one lock guards the queues and the store, workers wait on the condition
+        # for a host to come off cooldown or for new urls to show up
+        self.lock = RLock()
+        self.url_available = Condition(self.lock)
+        # number of urls handed out by get_tbd_url and not yet marked complete
+        self.in_flight = 0
+        store = STORES[self.config.store]
         
-        if not os.path.exists(self.config.save_file) and not restart:
+        if not store.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
             self.logger.info(
                 f"Did not find save file {self.config.save_file}, "
                 f"starting from seed.")
-        elif os.path.exists(self.config.save_file) and restart:
+        elif store.exists(self.config.save_file) and restart:
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            store.remove(self.config.save_file)
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        self.save = store(self.config.save_file, self.config.durability)
+        # what every page looked like when it was last fetched, for --recrawl
+        self.history = PageHistory(self.config)
+        # every fetched response, for replay.py. None when ARCHIVE is empty
+        self.archive = None
+        if self.config.archive:
+            self.archive = ResponseArchive(self.config.archive, self.config.archive_segment)
+        # url templates that turned out to be traps, see crawler/traps.py
+        self.traps = TrapDetector(self.config)
+        # in-memory index in front of the store, so duplicate links skip the disk
+        self.seen = None
+        if self.config.seen_index != "none":
+            self.seen = SEEN_INDEXES[self.config.seen_index](
+                self.config.seen_memory, self.config.seen_capacity)
+            self.seen.rebuild(self.save.hashes())
+            self.logger.info(
+                f"Rebuilt {self.config.seen_index} seen index with "
+                f"{self.seen.size} url hashes.")
+        if self.config.durability == "batch":
+            # flush on a timer too, so a crash loses at most FLUSHINTERVAL ms
+            self.flusher = Thread(target=self._flush_loop, daemon=True)
+            self.flusher.start()
+        # is_valid results cached under other rules are checked again as the
+        # urls come up, the rules are often changed after spotting a trap
+        rules = rules_version()
+        if self.save.rules_version() != rules:
+            self.save.reset_valid()
+            self.save.set_rules_version(rules)
+            self.save.sync()
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
@@ -40,43 +130,382 @@ class Frontier(object):
                 for url in self.config.seed_urls:
                     self.add_url(url)
 
-    # loads URLs from the save file and filters out invalids/ completed ones
+    # loads the pending URLs from the save file, skipping ones already known to be invalid
     def _parse_save_file(self):
-        ''' This function can be overridden for alternate saving techniques. '''
+        ''' This function can be overridden for alternate saving techniques.
+        Only the pending urls are read, and is_valid is not run here: urls
+        that were never checked are validated lazily in get_tbd_url, so the
+        workers can start fetching right away. '''
         total_count = len(self.save)
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
+        unchecked_count = 0
+        with self.lock:
+            for url, valid in self.save.pending():
+                if valid is False:
+                    continue
+                if valid is None:
+                    unchecked_count += 1
+                if len(self.queued) < self.config.max_queued:
+                    self._enqueue(url, checked=valid is not None)
+                else:
+                    # memory queue is full, the rest streams straight to disk
+                    self.spill.append(self._entry(url, 0, valid is not None))
                 tbd_count += 1
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
-            f"total urls discovered.")
+            f"total urls discovered ({unchecked_count} to validate lazily, "
+            f"{len(self.spill)} spilled to disk).")
+
+    # deferred is_valid check for a resumed url, the result is cached in the store
+    # caller must hold self.lock
+    def _revalidate(self, url):
+        valid = is_valid(url)
+        self.save.set_valid(get_urlhash(url), valid)
+        return valid
+
+    # the host of a url is what politeness is counted against
+    def _get_host(self, url):
+        return urlparse(url).netloc.lower()
+
+    # priority of a url, lower goes first (see crawler/scoring.py). the urls of
+    # a throttled url template go behind all the others
+    def _score(self, url, depth, host):
+        inlinks = self.inlinks.get(url, 1)
+        host_fetched = self.host_fetched.get(host, 0)
+        return (self.traps.penalty(url),) + tuple(
+            scorer(url, depth, inlinks, host_fetched) for scorer in self.scorers)
+
+    def _entry(self, url, depth, checked):
+        return (
+            self._score(url, depth, self._get_host(url)), next(self.counter),
+            url, depth, checked)
+
+    # puts a url in its host queue, and schedules the host if it was idle. the
+    # urls of a parked host only wait in the store
+    # caller must hold self.lock
+    def _enqueue(self, url, depth=0, checked=True):
+        host = self._get_host(url)
+        if host in self.parked:
+            return
+        self._push(host, self._entry(url, depth, checked))
+        if len(self.queued) > self.config.max_queued:
+            self._spill()
+
+    def _push(self, host, entry):
+        if entry[2] in self.queued:
+            # the entry it replaces stays in the heap until popped or compacted
+            self.stale += 1
+        heapq.heappush(self.host_queues.setdefault(host, list()), entry)
+        self.queued[entry[2]] = entry
+        if host not in self.scheduled:
+            self.scheduled.add(host)
+            heapq.heappush(self.cooling, (self.next_fetch_time.get(host, 0), host))
+        self.url_available.notify()
+        if self.stale > max(len(self.queued), 1024):
+            self._compact()
+
+    # best live entry of a host, dropping stale ones on the way
+    def _peek(self, host):
+        queue = self.host_queues.get(host)
+        while queue and self.queued.get(queue[0][2]) is not queue[0]:
+            heapq.heappop(queue)
+            self.stale -= 1
+        if not queue:
+            self.host_queues.pop(host, None)
+            return None
+        return queue[0]
+
+    # a host off cooldown competes with the others on the score of its best url
+    def _make_ready(self, host):
+        entry = self._peek(host)
+        if entry is None:
+            self.scheduled.discard(host)
+            return
+        score, _, url, depth, _ = entry
+        heapq.heappush(
+            self.ready, (self._score(url, depth, host), next(self.counter), host))
+
+    # moves the lowest priority entries to the spill file, down to 90% of MAXQUEUED
+    def _spill(self):
+        keep = self.config.max_queued * 9 // 10
+        entries = [
+            entry for queue in self.host_queues.values() for entry in queue
+            if self.queued.get(entry[2]) is entry]
+        spilled = heapq.nlargest(len(entries) - keep, entries)
+        for entry in spilled:
+            del self.queued[entry[2]]
+            self.inlinks.pop(entry[2], None)
+        self._compact()
+        self.spill.extend(spilled)
+        self.logger.debug(f"Spilled {len(spilled)} low priority urls to disk.")
+
+    # rebuilds every host heap with only its live entries
+    def _compact(self):
+        for host in list(self.host_queues):
+            queue = [e for e in self.host_queues[host] if self.queued.get(e[2]) is e]
+            heapq.heapify(queue)
+            if queue:
+                self.host_queues[host] = queue
+            else:
+                # the host stays scheduled, _make_ready drops it when it comes up
+                del self.host_queues[host]
+        self.stale = 0
+
+    # brings spilled entries back a segment at a time once the in-memory queue has drained
+    def _refill(self):
+        while self.spill and len(self.queued) <= self.config.max_queued // 2:
+            for entry in self.spill.pop_segment():
+                host = self._get_host(entry[2])
+                if host not in self.parked:
+                    self._push(host, entry)
+        if len(self.queued) > self.config.max_queued:
+            self._spill()
 
     # retrieves the next URL to be downloaded
     # i think tbd means -> get TO BE DETERMINED url
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
-        
-    # adds a url IF its not in the shelf - as in not seen before
-    def add_url(self, url):
-        url = normalize(url)
-        urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
+        ''' Hands out the best scored url among the hosts that are off cooldown.
+        Blocks while every pending host is cooling down, or while the queues
+        are empty but other workers still hold urls that may add more links.
+        Returns None only when nothing is queued and nothing is in flight. '''
+        with self.url_available:
+            while True:
+                url, wait = self._next_tbd_url()
+                if url is not None:
+                    return url
+                if wait is not None:
+                    # a url for an idle host can still arrive before then
+                    self.url_available.wait(wait)
+                    continue
+                if self.in_flight == 0:
+                    # crawl is over, wake the other waiting workers so they stop too
+                    self.url_available.notify_all()
+                    return None
+                self.url_available.wait()
+
+    # non-blocking get_tbd_url for the asyncio engine, same return values as _next_tbd_url
+    def poll_tbd_url(self):
+        with self.lock:
+            return self._next_tbd_url()
+
+    # (url, None) when a host is ready, (None, seconds until the next host is
+    # off cooldown) when all are cooling down, (None, None) when nothing is queued.
+    # caller must hold self.lock
+    def _next_tbd_url(self):
+        while True:
+            if self.spill and len(self.queued) <= self.config.max_queued // 2:
+                self._refill()
+            now = time.monotonic()
+            while self.cooling and self.cooling[0][0] <= now:
+                _, host = heapq.heappop(self.cooling)
+                if self.next_fetch_time.get(host, 0) > now:
+                    # backed off by retry_url while it was cooling down
+                    heapq.heappush(self.cooling, (self.next_fetch_time[host], host))
+                else:
+                    self._make_ready(host)
+            if not self.ready:
+                return None, (self.cooling[0][0] - now if self.cooling else None)
+            key, _, host = heapq.heappop(self.ready)
+            if self.next_fetch_time.get(host, 0) > now:
+                # backed off by retry_url while it was ready
+                heapq.heappush(self.cooling, (self.next_fetch_time[host], host))
+                continue
+            entry = self._peek(host)
+            if entry is None:
+                self.scheduled.discard(host)
+                continue
+            score, _, url, depth, checked = entry
+            if self._score(url, depth, host) != key:
+                # its best url changed since it became ready, compete again
+                self._make_ready(host)
+                continue
+            heapq.heappop(self.host_queues[host])
+            del self.queued[url]
+            self.inlinks.pop(url, None)
+            if not checked and not self._revalidate(url):
+                # nothing was fetched, so the host keeps its place in line
+                self._make_ready(host)
+                continue
+            if self.traps.is_blocked(url):
+                # its template was blocked after it was queued, it stays pending
+                self._make_ready(host)
+                continue
+            self.host_fetched[host] = self.host_fetched.get(host, 0) + 1
+            # the host stays scheduled but out of the heaps until _release
+            self.fetching[url] = host
+            self.depth_of[url] = depth
+            self.in_flight += 1
+            return url, None
+
+    # a url counts as seen whether it is already in the store or still buffered
+    def _is_seen(self, urlhash):
+        if urlhash in self.unsaved:
+            return True
+        if self.seen is not None:
+            seen = self.seen.check(urlhash)
+            if seen is not None:
+                return seen
+        return urlhash in self.save
+
+    # records the state of urls, either straight to disk or into the buffer
+    # items is a list of (urlhash, (url, completed))
+    def _write(self, items):
+        with self.lock:
+            if self.config.durability != "batch":
+                self.save.put_many(items)
+                self.save.sync()
+                return
+            self.unsaved.update(items)
+            if len(self.unsaved) >= self.config.flush_every:
+                self.flush()
+
+    # writes every buffered change to the store with a single sync
+    def flush(self):
+        with self.lock:
+            if not self.unsaved:
+                return
+            self.save.put_many(self.unsaved.items())
+            self.unsaved.clear()
             self.save.sync()
-            self.to_be_downloaded.append(url)
+            self.traps.flush()
+
+    def _flush_loop(self):
+        while not self.closed.wait(self.config.flush_interval):
+            self.flush()
+
+    # final flush on shutdown, nothing buffered is lost after this
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        with self.lock:
+            self.flush()
+            self.save.close()
+        self.history.close()
+        self.traps.close()
+        if self.archive is not None:
+            self.archive.close()
+
+    # adds a url IF its not in the shelf - as in not seen before
+    def add_url(self, url, parent=None):
+        self.add_urls([url], parent)
+
+    # adds all the links of a page at once: duplicates within the batch are
+    # dropped before taking the lock, and the new urls are written with one sync.
+    # parent is the page the links were found on, it decides their depth. resp
+    # is its response when the links were scraped from it: only an html page
+    # downloaded with a 200 counts towards the trap detection of its template
+    def add_urls(self, urls, parent=None, resp=None):
+        batch = dict()
+        for url in urls:
+            url = canonicalize(url)
+            batch.setdefault(get_urlhash(url), url)
+        with self.lock:
+            depth = self.depth_of.get(parent, 0) + 1 if parent is not None else 0
+            new = list()
+            for urlhash, url in batch.items():
+                if not self._is_seen(urlhash):
+                    new.append((urlhash, (url, False)))
+                elif url in self.queued:
+                    self._add_inlink(url)
+            if parent is not None and resp is not None and resp.status == 200 \
+                    and classify(resp) == HTML:
+                self.traps.record(parent, len(batch), len(new))
+            if not new:
+                return
+            self._write(new)
+            for urlhash, (url, _) in new:
+                if self.seen is not None:
+                    self.seen.add(urlhash)
+                # urls of a blocked template are only saved, they stay pending
+                # for a run where the block has expired
+                if not self.traps.is_blocked(url):
+                    self._enqueue(url, depth)
+
+    # one more page links to a queued url, re-queue it if that changes its score
+    # caller must hold self.lock
+    def _add_inlink(self, url):
+        self.inlinks[url] = self.inlinks.get(url, 1) + 1
+        host = self._get_host(url)
+        score, _, _, depth, checked = self.queued[url]
+        new_score = self._score(url, depth, host)
+        if new_score != score:
+            # the old entry goes stale, _peek skips it
+            self._push(host, (new_score, next(self.counter), url, depth, checked))
     
+    # puts back a url whose download failed and keeps its host away for delay
+    # seconds, instead of marking it complete. returns False once the url has
+    # used up its RETRIES, the caller should then mark it complete
+    def retry_url(self, url, delay):
+        with self.lock:
+            attempts = self.retries[url] = self.retries.get(url, 0) + 1
+            if attempts > self.config.max_retries:
+                del self.retries[url]
+                return False
+            self._enqueue(url, self.depth_of.pop(url, 0))
+            self._release(url, max(delay, self.config.time_delay))
+            if self.in_flight > 0:
+                self.in_flight -= 1
+            return True
+
+    # gives up on the host of a url for the rest of this run, its host stopped
+    # responding. unlike mark_url_complete the url and every other url of the
+    # host stay pending in the store, so the next run tries them again
+    def park_url(self, url):
+        with self.lock:
+            host = self.fetching.pop(url, None) or self._get_host(url)
+            if host not in self.parked:
+                self.parked.add(host)
+                dropped = 0
+                for entry in self.host_queues.pop(host, list()):
+                    if self.queued.get(entry[2]) is entry:
+                        del self.queued[entry[2]]
+                        self.inlinks.pop(entry[2], None)
+                        dropped += 1
+                    else:
+                        self.stale -= 1
+                self.logger.warning(
+                    f"Parked {host} for the rest of this run, its urls stay pending "
+                    f"for the next one ({dropped + 1} were queued).")
+            # the host may still sit in the cooling or ready heap, _make_ready
+            # finds its queue empty then
+            self.scheduled.discard(host)
+            self.depth_of.pop(url, None)
+            self.retries.pop(url, None)
+            if self.in_flight > 0:
+                self.in_flight -= 1
+            if self.in_flight == 0 and not self.scheduled:
+                self.url_available.notify_all()
+
+    # the download of a url is over, its host may be fetched again delay seconds from now
+    # caller must hold self.lock
+    def _release(self, url, delay):
+        host = self.fetching.pop(url, None)
+        if host is None:
+            return
+        self.next_fetch_time[host] = max(
+            self.next_fetch_time.get(host, 0), time.monotonic() + delay)
+        if self._peek(host) is not None:
+            heapq.heappush(self.cooling, (self.next_fetch_time[host], host))
+            self.url_available.notify()
+        else:
+            self.scheduled.discard(host)
+
     # marks a URL as completed after it has been processed
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        with self.lock:
+            if not self._is_seen(urlhash):
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+            self._write([(urlhash, (url, True))])
+            self._release(url, self.config.time_delay)
+            self.depth_of.pop(url, None)
+            self.retries.pop(url, None)
+            if self.in_flight > 0:
+                self.in_flight -= 1
+            if self.in_flight == 0 and not self.scheduled:
+                # last url is done, let the waiting workers see the crawl is over
+                self.url_available.notify_all()
@@ -0,0 +1,121 @@
+import os
+import multiprocessing
+from threading import Thread
+from queue import Queue, Empty
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from utils import get_logger
+from utils.download import download, log_transport_stats
+from crawler.frontier import Frontier
+import scraper
+from scraper_utils.parsers import set_backend
+from utils import canonical
+
+'''
+staged alternative to the Worker threads (python3 launch.py --engine pipeline)
+    fetchers -> THREADCOUNT threads that only download, into a bounded queue
+    parsers  -> a process pool running scraper.parse_page, so html parsing,
+                tokenizing and fingerprinting use every core instead of
+                fighting over the GIL
+    merger   -> one thread applying each parsed page with scraper.merge_page
+                (report statistics, near-duplicate check) and handing the
+                links to the frontier
+'''
+
+
+# the parser processes do not share the module globals of this one
+def _init_parser(parser, canonical_settings):
+    set_backend(parser)
+    canonical.configure(**canonical_settings)
+
+
+class PipelineCrawler(object):
+    def __init__(self, config, restart, frontier_factory=Frontier):
+        self.config = config
+        self.logger = get_logger("CRAWLER")
+        self.frontier = frontier_factory(config, restart)
+        # downloaded (url, resp) waiting for a parser, bounded so fetchers can't run ahead
+        self.fetched = Queue(maxsize=self.config.pipeline_queue)
+        self.parsers = self.config.parsers or os.cpu_count()
+
+    def start(self):
+        # spawn, so the parser processes don't inherit locks held by the fetcher threads
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.parsers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parser, initargs=(self.config.parser, canonical.settings()))
+        self.fetchers = [
+            Thread(target=self._fetch, args=(fetcher_id,), daemon=True)
+            for fetcher_id in range(self.config.threads_count)]
+        for fetcher in self.fetchers:
+            fetcher.start()
+        try:
+            self._merge()
+        finally:
+            self.pool.shutdown()
+            self.frontier.close()
+            log_transport_stats(self.logger)
+
+    def _fetch(self, fetcher_id):
+        logger = get_logger(f"Fetcher-{fetcher_id}", "Worker")
+        history = self.frontier.history
+        while True:
+            tbd_url = self.frontier.get_tbd_url()
+            if not tbd_url:
+                logger.info("Frontier is empty. Stopping Fetcher.")
+                break
+            try:
+                # --recrawl: pages fetched recently, or unchanged since, never reach the parsers
+                links = history.fresh_links(tbd_url)
+                if links is None:
+                    resp = download(tbd_url, self.config, logger, history.validators(tbd_url))
+                    logger.info(
+                        f"Downloaded {tbd_url}, status <{resp.status}>, "
+                        f"using cache {self.config.cache_server}.")
+                    if resp.retry_after is not None and self.frontier.retry_url(tbd_url, resp.retry_after):
+                        logger.warning(f"Retrying {tbd_url} in {resp.retry_after:.1f}s.")
+                        continue
+                    if resp.host_dead:
+                        # the host stopped responding, its urls are left for the next run
+                        self.frontier.park_url(tbd_url)
+                        continue
+                    if self.frontier.archive is not None:
+                        self.frontier.archive.append(tbd_url, resp)
+                    links = history.unchanged_links(tbd_url, resp)
+                if links is not None:
+                    self.frontier.add_urls(links, parent=tbd_url)
+                    self.frontier.mark_url_complete(tbd_url)
+                    continue
+            except Exception as e:
+                logger.error(f"Failed to download {tbd_url}: {e}")
+                resp = None
+            self.fetched.put((tbd_url, resp))
+
+    # keeps every parser busy and applies the parsed pages as they finish
+    def _merge(self):
+        parsing = dict()
+        while True:
+            while len(parsing) < 2 * self.parsers:
+                try:
+                    url, resp = self.fetched.get(timeout=0.05 if parsing else 0.5)
+                except Empty:
+                    break
+                if resp is None:
+                    self.frontier.mark_url_complete(url)
+                    continue
+                parsing[self.pool.submit(scraper.parse_page, url, resp)] = (url, resp)
+            if not parsing:
+                if not any(fetcher.is_alive() for fetcher in self.fetchers) and self.fetched.empty():
+                    self.logger.info("Frontier is empty. Stopping Crawler.")
+                    return
+                continue
+            done, _ = wait(parsing, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, resp = parsing.pop(future)
+                try:
+                    links = scraper.merge_page(url, future.result())
+                    self.frontier.history.record(url, resp, links)
+                    self.frontier.add_urls(links, parent=url, resp=resp)
+                except Exception as e:
+                    self.logger.error(f"Failed to process {url}: {e}")
+                finally:
+                    self.frontier.mark_url_complete(url)
@@ -0,0 +1,112 @@
+import time
+import shelve
+import hashlib
+from threading import Lock
+
+from utils import get_logger, get_urlhash
+
+'''
+incremental recrawl (python3 launch.py --recrawl). every page downloaded with
+a 200 leaves a record in the METAFILE shelve
+    urlhash -> {"url", "fetched", "etag", "last_modified", "hash", "links"}
+a recrawl starts the frontier again from the seed urls, but for a url it has a
+record of
+    1) pages fetched less than RECRAWLAFTER hours ago are not downloaded at all
+    2) the download sends the etag / last modified date along (inm / ims in the
+       cache server query), a 304 answer means the page did not change
+    3) otherwise a body with the same hash as last time did not change either
+an unchanged page skips scraper.scraper, its recorded links go straight to the
+frontier so the crawl still reaches everything behind it. only changed and new
+pages are parsed, and only those count towards this run's report
+'''
+
+
+def body_hash(content):
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+class PageHistory(object):
+    def __init__(self, config):
+        self.logger = get_logger("RECRAWL")
+        self.enabled = bool(config.meta_file)
+        # records are always written, but only looked at with --recrawl
+        self.recrawl = self.enabled and config.recrawl
+        self.recrawl_after = config.recrawl_after
+        self.lock = Lock()
+        self.unchanged = 0
+        self.changed = 0
+        if self.enabled:
+            self.meta = shelve.open(config.meta_file)
+            if self.recrawl:
+                self.logger.info(f"Recrawling with {len(self.meta)} page records.")
+
+    def _get(self, url):
+        with self.lock:
+            return self.meta.get(get_urlhash(url))
+
+    # links of a page fetched recently enough to not download it again, else None
+    def fresh_links(self, url):
+        if not self.recrawl or not self.recrawl_after:
+            return None
+        record = self._get(url)
+        if record is None or time.time() - record["fetched"] > self.recrawl_after:
+            return None
+        self.unchanged += 1
+        return record["links"]
+
+    # (etag, last modified) to send with the download of a url, None for new pages
+    def validators(self, url):
+        if not self.recrawl:
+            return None
+        record = self._get(url)
+        if record is None:
+            return None
+        return record["etag"], record["last_modified"]
+
+    # recorded links when the download shows the page did not change, else None
+    def unchanged_links(self, url, resp):
+        if not self.recrawl or resp.status not in (200, 304):
+            return None
+        record = self._get(url)
+        if record is None:
+            return None
+        if resp.status == 200 and body_hash(resp.content) != record["hash"]:
+            return None
+        record["fetched"] = time.time()
+        with self.lock:
+            self.meta[get_urlhash(url)] = record
+        self.unchanged += 1
+        return record["links"]
+
+    def record(self, url, resp, links):
+        if not self.enabled or resp.status != 200 or resp.content is None:
+            return
+        record = {
+            "url": url,
+            "fetched": time.time(),
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "hash": body_hash(resp.content),
+            "links": list(links)}
+        with self.lock:
+            self.meta[get_urlhash(url)] = record
+        self.changed += 1
+
+    # scraper.scraper for changed pages, the recorded links for unchanged ones
+    def scrape(self, url, resp, scraper):
+        links = self.unchanged_links(url, resp)
+        if links is not None:
+            return links
+        links = scraper(url, resp)
+        self.record(url, resp, links)
+        return links
+
+    def close(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.meta.close()
+        if self.recrawl:
+            self.logger.info(
+                f"Recrawl found {self.changed} new or changed pages, "
+                f"{self.unchanged} unchanged.")
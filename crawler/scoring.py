@@ -0,0 +1,32 @@
+'''
+scorers decide which pending url is downloaded next. a scorer is a function
+    scorer(url, depth, inlinks, host_fetched) -> number
+    url          -> the pending url
+    depth        -> number of links followed from a seed url to reach it
+    inlinks      -> number of pages that linked to it so far
+    host_fetched -> number of pages already downloaded from its host
+lower numbers are downloaded first. the frontier combines the SCORERS listed in
+config.ini into a tuple, so the first scorer decides and the next ones break ties
+'''
+
+
+# breadth first: top level pages before the ones buried deep in a subdomain
+def depth_scorer(url, depth, inlinks, host_fetched):
+    return depth
+
+
+# hosts we downloaded the least from go first, so one big subdomain can't starve the rest
+def fairness_scorer(url, depth, inlinks, host_fetched):
+    return host_fetched
+
+
+# pages many other pages link to are usually the important ones
+def inlinks_scorer(url, depth, inlinks, host_fetched):
+    return -inlinks
+
+
+SCORERS = {
+    "depth": depth_scorer,
+    "fairness": fairness_scorer,
+    "inlinks": inlinks_scorer,
+}
@@ -0,0 +1,98 @@
+import math
+from array import array
+
+'''
+in-memory indexes of the url hashes the frontier has already seen, checked
+before the store so most links never cost a disk lookup. check() answers
+    True  -> definitely seen
+    False -> definitely new
+    None  -> not sure, ask the store
+both indexes live in a fixed block of memory (SEENMEMORY in config.ini) and
+are rebuilt from the store's hashes on startup
+'''
+
+
+class HashSetIndex(object):
+    ''' Open addressing table of 64-bit url hash prefixes in a flat array.
+    Answers exactly (up to 64-bit collisions) until it runs out of room,
+    after which urls it could not hold are looked up in the store. '''
+
+    MAX_LOAD = 0.7
+
+    def __init__(self, memory_bytes, capacity):
+        self.slots = array("Q", bytes(max(memory_bytes // 8, 1) * 8))
+        self.size = 0
+        self.full = False
+
+    @staticmethod
+    def _key(urlhash):
+        # 0 marks an empty slot
+        return int(urlhash[:16], 16) or 1
+
+    def add(self, urlhash):
+        if self.full:
+            return
+        key = self._key(urlhash)
+        slots = self.slots
+        i = key % len(slots)
+        while slots[i]:
+            if slots[i] == key:
+                return
+            i = (i + 1) % len(slots)
+        slots[i] = key
+        self.size += 1
+        if self.size >= len(slots) * self.MAX_LOAD:
+            self.full = True
+
+    def check(self, urlhash):
+        key = self._key(urlhash)
+        slots = self.slots
+        i = key % len(slots)
+        while slots[i]:
+            if slots[i] == key:
+                return True
+            i = (i + 1) % len(slots)
+        return None if self.full else False
+
+    def rebuild(self, urlhashes):
+        for urlhash in urlhashes:
+            self.add(urlhash)
+
+
+class BloomIndex(object):
+    ''' Bloom filter sized for SEENCAPACITY urls. Never has false negatives,
+    so new urls skip the store, and a hit is confirmed by the store. '''
+
+    def __init__(self, memory_bytes, capacity):
+        self.bits = bytearray(max(memory_bytes, 1))
+        self.m = len(self.bits) * 8
+        # optimal number of hash functions for the expected number of urls
+        self.k = min(16, max(1, round(self.m / max(capacity, 1) * math.log(2))))
+        self.size = 0
+
+    def _positions(self, urlhash):
+        # double hashing on two 64-bit slices of the sha256 digest
+        h1 = int(urlhash[:16], 16)
+        h2 = int(urlhash[16:32], 16) | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def add(self, urlhash):
+        for pos in self._positions(urlhash):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.size += 1
+
+    def check(self, urlhash):
+        for pos in self._positions(urlhash):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return None
+
+    def rebuild(self, urlhashes):
+        for urlhash in urlhashes:
+            self.add(urlhash)
+
+
+SEEN_INDEXES = {
+    "hashset": HashSetIndex,
+    "bloom": BloomIndex,
+}
@@ -0,0 +1,66 @@
+import os
+import zlib
+import shutil
+import pickle
+from collections import deque
+
+'''
+overflow queue for the frontier. when more urls are pending than MAXQUEUED,
+the lowest priority queue entries are appended here and read back once the
+in-memory queue has drained. entries are buffered in memory until a full
+segment of SPILLSEGMENT entries is collected, which is then written to its own
+compressed file in one go. reading takes back the oldest segment at a time, so
+disk access is sequential and memory stays at about one segment no matter how
+big the frontier gets. the save file is still the source of truth for pending
+urls, so the segments are thrown away on startup
+'''
+
+
+class SegmentedQueue(object):
+    def __init__(self, directory, segment_size=10000):
+        self.directory = directory
+        self.segment_size = segment_size
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        # ids of the segment files on disk, oldest first
+        self.segments = deque()
+        self.next_segment = 0
+        self.buffer = list()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"{segment:08d}.seg")
+
+    def append(self, entry):
+        self.buffer.append(entry)
+        self.count += 1
+        if len(self.buffer) >= self.segment_size:
+            self._write_segment()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def _write_segment(self):
+        with open(self._segment_path(self.next_segment), "wb") as f:
+            f.write(zlib.compress(pickle.dumps(self.buffer, pickle.HIGHEST_PROTOCOL)))
+        self.segments.append(self.next_segment)
+        self.next_segment += 1
+        self.buffer = list()
+
+    # takes back the oldest entries: a whole segment from disk, or the
+    # buffer once every segment has been read
+    def pop_segment(self):
+        if self.segments:
+            path = self._segment_path(self.segments.popleft())
+            with open(path, "rb") as f:
+                entries = pickle.loads(zlib.decompress(f.read()))
+            os.remove(path)
+        else:
+            entries, self.buffer = self.buffer, list()
+        self.count -= len(entries)
+        return entries
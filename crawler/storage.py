@@ -0,0 +1,242 @@
+import os
+import shelve
+import sqlite3
+
+'''
+storage backends for the frontier. every backend keeps track of
+    1) every url hash that was ever discovered (so nothing is downloaded twice)
+    2) which of those urls are still pending and which are completed
+    3) for pending urls, the cached result of is_valid (None if never checked).
+       the frontier only adds urls that already passed is_valid (the scraper
+       filters its links), so put stores them as valid
+    4) the version of the is_valid rules those results come from, the frontier
+       resets them with reset_valid when the rules changed
+the frontier only talks to the backend through the methods below, so a new
+backend only has to implement them and be added to STORES
+'''
+
+
+class ShelveStore(object):
+    ''' The original save file: a dbm shelve of sha256 -> (url, completed),
+    plus a second shelve of sha256 -> (url, valid) holding only pending urls
+    so resuming does not have to unpickle every url ever discovered. '''
+
+    # dbm picks the file extensions itself, depending on which dbm module is available
+    EXTENSIONS = ("", ".db", ".dat", ".dir", ".bak")
+    PENDING_SUFFIX = ".pending"
+    # key of the rules version in the pending index, url hashes are hex digests
+    RULES_KEY = "rules"
+
+    def __init__(self, save_file, durability="sync"):
+        self.save_file = save_file
+        # sync: every sync goes down to the disk with fsync, not only to the OS
+        self.fsync = durability == "sync"
+        # save files from before the pending index existed get it built once
+        build_index = (
+            self.exists(save_file)
+            and not self.exists(save_file + self.PENDING_SUFFIX))
+        self.save = shelve.open(save_file)
+        self.pending_index = shelve.open(save_file + self.PENDING_SUFFIX)
+        if build_index:
+            for urlhash, (url, completed) in self.save.items():
+                if not completed:
+                    self.pending_index[urlhash] = (url, None)
+            self.pending_index.sync()
+
+    @classmethod
+    def exists(cls, save_file):
+        return any(os.path.exists(save_file + ext) for ext in cls.EXTENSIONS)
+
+    @classmethod
+    def remove(cls, save_file):
+        for name in (save_file, save_file + cls.PENDING_SUFFIX):
+            for ext in cls.EXTENSIONS:
+                if os.path.exists(name + ext):
+                    os.remove(name + ext)
+
+    # number of urls ever discovered
+    def __len__(self):
+        return len(self.save)
+
+    def __contains__(self, urlhash):
+        return urlhash in self.save
+
+    # every url hash ever discovered, used to rebuild the in-memory seen index
+    def hashes(self):
+        yield from self.save.keys()
+
+    def put(self, urlhash, url, completed):
+        self.save[urlhash] = (url, completed)
+        if completed:
+            if urlhash in self.pending_index:
+                del self.pending_index[urlhash]
+        else:
+            self.pending_index[urlhash] = (url, True)
+
+    # items is an iterable of (urlhash, (url, completed))
+    def put_many(self, items):
+        for urlhash, (url, completed) in items:
+            self.put(urlhash, url, completed)
+
+    # caches the is_valid result of a pending url for the next resume
+    def set_valid(self, urlhash, valid):
+        if urlhash in self.pending_index:
+            url, _ = self.pending_index[urlhash]
+            self.pending_index[urlhash] = (url, valid)
+
+    # forgets every cached is_valid result
+    def reset_valid(self):
+        for urlhash in list(self.pending_index.keys()):
+            if urlhash != self.RULES_KEY:
+                url, _ = self.pending_index[urlhash]
+                self.pending_index[urlhash] = (url, None)
+
+    def rules_version(self):
+        return self.pending_index.get(self.RULES_KEY)
+
+    def set_rules_version(self, version):
+        self.pending_index[self.RULES_KEY] = version
+
+    # yields (url, valid) from the pending index only
+    def pending(self):
+        for urlhash, entry in self.pending_index.items():
+            if urlhash != self.RULES_KEY:
+                yield entry
+
+    def sync(self):
+        self.save.sync()
+        self.pending_index.sync()
+        if self.fsync:
+            self._fsync()
+
+    # shelve.sync only hands the dbm files to the OS. dbm.dumb also replaces its
+    # .dir file on every sync, so the directory entry is synced too
+    def _fsync(self):
+        paths = [
+            name + ext for name in (self.save_file, self.save_file + self.PENDING_SUFFIX)
+            for ext in self.EXTENSIONS if os.path.exists(name + ext)]
+        if os.name == "posix":
+            paths.append(os.path.dirname(os.path.abspath(self.save_file)))
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def close(self):
+        self.save.close()
+        self.pending_index.close()
+
+
+class SqliteStore(object):
+    ''' SQLite save file in WAL mode with indexed tables for seen hashes,
+    pending urls (in discovery order) and completed urls. WAL lets other
+    processes read the progress while the crawler is writing. '''
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS seen (
+            urlhash TEXT PRIMARY KEY
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS pending (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            urlhash TEXT NOT NULL UNIQUE,
+            url TEXT NOT NULL,
+            valid INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS completed (
+            urlhash TEXT PRIMARY KEY,
+            url TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        ) WITHOUT ROWID;
+    """
+    EXTENSIONS = ("", "-wal", "-shm")
+
+    def __init__(self, save_file, durability="sync"):
+        # the frontier serializes every call with its own lock, so sharing the
+        # connection between worker threads is safe
+        self.db = sqlite3.connect(save_file, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # FULL fsyncs on every commit, NORMAL only at checkpoints (still crash safe in WAL)
+        self.db.execute(f"PRAGMA synchronous={'FULL' if durability == 'sync' else 'NORMAL'}")
+        self.db.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(pending)")}
+        if "valid" not in columns:
+            self.db.execute("ALTER TABLE pending ADD COLUMN valid INTEGER")
+        self.db.commit()
+
+    @classmethod
+    def exists(cls, save_file):
+        return os.path.exists(save_file)
+
+    @classmethod
+    def remove(cls, save_file):
+        for ext in cls.EXTENSIONS:
+            if os.path.exists(save_file + ext):
+                os.remove(save_file + ext)
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def __contains__(self, urlhash):
+        return self.db.execute(
+            "SELECT 1 FROM seen WHERE urlhash = ?", (urlhash,)).fetchone() is not None
+
+    def hashes(self):
+        for (urlhash,) in self.db.execute("SELECT urlhash FROM seen"):
+            yield urlhash
+
+    def put(self, urlhash, url, completed):
+        self.put_many([(urlhash, (url, completed))])
+
+    def put_many(self, items):
+        new, done = list(), list()
+        for urlhash, (url, completed) in items:
+            (done if completed else new).append((urlhash, url))
+        seen = [(urlhash,) for urlhash, _ in new + done]
+        self.db.executemany("INSERT OR IGNORE INTO seen (urlhash) VALUES (?)", seen)
+        self.db.executemany(
+            "INSERT OR IGNORE INTO pending (urlhash, url, valid) VALUES (?, ?, 1)", new)
+        self.db.executemany(
+            "INSERT OR REPLACE INTO completed (urlhash, url) VALUES (?, ?)", done)
+        self.db.executemany(
+            "DELETE FROM pending WHERE urlhash = ?", [(urlhash,) for urlhash, _ in done])
+
+    def set_valid(self, urlhash, valid):
+        self.db.execute(
+            "UPDATE pending SET valid = ? WHERE urlhash = ?", (int(valid), urlhash))
+
+    def reset_valid(self):
+        self.db.execute("UPDATE pending SET valid = NULL")
+
+    def rules_version(self):
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'rules'").fetchone()
+        return None if row is None else row[0]
+
+    def set_rules_version(self, version):
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('rules', ?)", (version,))
+
+    # only touches the pending table, no matter how many urls were completed
+    def pending(self):
+        for url, valid in self.db.execute("SELECT url, valid FROM pending ORDER BY id"):
+            yield url, (None if valid is None else bool(valid))
+
+    def completed_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM completed").fetchone()[0]
+
+    def sync(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+STORES = {
+    "shelve": ShelveStore,
+    "sqlite": SqliteStore,
+}
@@ -0,0 +1,165 @@
+import re
+import time
+import shelve
+from functools import lru_cache
+from threading import Lock
+from urllib.parse import urlsplit
+
+from utils import get_logger
+
+'''
+adaptive crawler trap detection, next to the fixed rules of scraper.is_valid.
+every url is reduced to a template of its host and path, with the parts that
+change from one page of a trap to the next replaced by placeholders
+    https://www.ics.uci.edu/~lab/photos/2024-05-13/7 -> www.ics.uci.edu/~lab/photos/{date}/{n}
+and every html page downloaded with a 200 is counted against the template of
+its url. errors, dead hosts and other content say nothing about the template
+    fetches -> pages parsed
+    fresh   -> pages that had at least one link the frontier had not seen
+    empty   -> pages without a single link to crawl: near-duplicates (the
+               scraper returns nothing for them) and dead ends
+the counts decay by 1 - 1 / TRAPWINDOW with every fetch, so they describe about
+the last TRAPWINDOW pages and a template that turns into a trap late is caught
+as fast as a new one. once a template has TRAPFETCHES fetches it is
+    blocked   -> when more than TRAPEMPTY of its pages were empty, its pending
+                 and future urls are not crawled. they stay pending in the
+                 save file, and after TRAPEXPIRE hours the counts start over
+                 and the template is judged again
+    throttled -> when less than TRAPFRESH of its pages found new links, its
+                 urls lose to every other url of their host, and their host
+                 to the hosts with other urls (see Frontier._score), until
+                 the template finds new links again
+the counts and decisions are kept in the TRAPFILE shelve, so a restart (even
+with --restart) remembers them. delete the file to forget every decision
+'''
+
+OK, THROTTLED, BLOCKED = "ok", "throttled", "blocked"
+
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+# 8 or more hex digits with at least one digit, so plain words stay
+_HASH = re.compile(r"(?<![0-9a-z])(?=[a-f]*[0-9])[0-9a-f]{8,}(?![0-9a-z])")
+_DATE = re.compile(
+    r"(?<![0-9])(?:19|20)[0-9]{2}([-_.]?)(?:0[1-9]|1[0-2])(?:\1(?:0[1-9]|[12][0-9]|3[01]))?(?![0-9])")
+_NUMBER = re.compile(r"[0-9]+")
+
+
+@lru_cache(maxsize=1 << 16)
+def url_template(url):
+    parsed = urlsplit(url)
+    template = parsed.path.lower()
+    template = _UUID.sub("{hash}", template)
+    template = _DATE.sub("{date}", template)
+    template = _HASH.sub("{hash}", template)
+    template = _NUMBER.sub("{n}", template)
+    if parsed.query:
+        names = sorted(set(param.partition("=")[0].lower() for param in parsed.query.split("&")))
+        template += "?" + "&".join(names)
+    return parsed.netloc.lower() + template
+
+
+class TrapDetector(object):
+    def __init__(self, config):
+        self.logger = get_logger("TRAPS")
+        self.enabled = bool(config.trap_file)
+        self.min_fetches = config.trap_fetches
+        self.max_empty = config.trap_empty
+        self.min_fresh = config.trap_fresh
+        self.expire = config.trap_expire
+        self.decay = 1 - 1 / config.trap_window
+        self.lock = Lock()
+        # template -> {"fetches", "fresh", "empty", "decision"}
+        self.templates = dict()
+        # templates changed since the last flush
+        self.dirty = set()
+        if self.enabled:
+            self.store = shelve.open(config.trap_file)
+            self.templates.update(self.store)
+            decisions = [stats["decision"] for stats in self.templates.values()]
+            self.logger.info(
+                f"Loaded {len(self.templates)} url templates, "
+                f"{decisions.count(THROTTLED)} throttled, {decisions.count(BLOCKED)} blocked.")
+
+    def decision(self, url):
+        if not self.enabled:
+            return OK
+        template = url_template(url)
+        stats = self.templates.get(template)
+        if stats is None:
+            return OK
+        if stats["decision"] == BLOCKED and time.time() - stats.get("decided", 0) > self.expire:
+            self._unblock(template)
+            return OK
+        return stats["decision"]
+
+    def _unblock(self, template):
+        with self.lock:
+            stats = self.templates[template]
+            if stats["decision"] != BLOCKED:
+                return
+            self.logger.info(
+                f"Url template {template} was blocked for more than "
+                f"{self.expire / 3600:g} hours, judging it again. The urls it "
+                f"held back stay pending for the next run.")
+            stats = self.templates[template] = {"fetches": 0, "fresh": 0, "empty": 0, "decision": OK}
+            self.store[template] = stats
+            self.store.sync()
+
+    def is_blocked(self, url):
+        return self.decision(url) == BLOCKED
+
+    # 1 for the urls of a throttled template, 0 for the others, lower goes first
+    def penalty(self, url):
+        return 1 if self.decision(url) == THROTTLED else 0
+
+    # links -> links the scraper returned for the page, new -> how many of them
+    # the frontier had not seen
+    def record(self, url, links, new):
+        if not self.enabled:
+            return
+        template = url_template(url)
+        with self.lock:
+            stats = self.templates.get(template)
+            if stats is None:
+                stats = self.templates[template] = {"fetches": 0, "fresh": 0, "empty": 0, "decision": OK}
+            stats["fetches"] = stats["fetches"] * self.decay + 1
+            stats["fresh"] = stats["fresh"] * self.decay + (new > 0)
+            stats["empty"] = stats["empty"] * self.decay + (links == 0)
+            self.dirty.add(template)
+            if stats["fetches"] >= self.min_fetches and stats["decision"] != BLOCKED:
+                self._decide(template, stats)
+
+    def _decide(self, template, stats):
+        fetches = stats["fetches"]
+        if stats["empty"] > self.max_empty * fetches:
+            decision = BLOCKED
+        elif stats["fresh"] < self.min_fresh * fetches:
+            decision = THROTTLED
+        else:
+            decision = OK
+        if decision == stats["decision"]:
+            return
+        stats["decision"] = decision
+        stats["decided"] = time.time()
+        self.logger.info(
+            f"Url template {template} is now {decision}: of about its last "
+            f"{fetches:.0f} fetches, {stats['fresh'] / fetches:.0%} found new links "
+            f"and {stats['empty'] / fetches:.0%} had none.")
+        # decisions are written right away, the counts with the next flush
+        self.store[template] = stats
+        self.store.sync()
+
+    def flush(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            for template in self.dirty:
+                self.store[template] = self.templates[template]
+            self.dirty.clear()
+            self.store.sync()
+
+    def close(self):
+        if not self.enabled:
+            return
+        self.flush()
+        with self.lock:
+            self.store.close()
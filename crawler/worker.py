@@ -4,7 +4,6 @@ from inspect import getsource
 from utils.download import download
 from utils import get_logger
 import scraper
-import time
 
 '''
     each worker represents a single thread in the crawler
@@ -30,18 +29,47 @@ class Worker(Thread):
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.") # stops crawling because nothing else... makes sense
                 break
-            # download function is form utils/download.py to fetch content of a URL
-            resp = download(tbd_url, self.config, self.logger) # download returns 
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            # passes the downloaded information to the scraper function to get new links
-            # this is what we are implementing
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            # utilizes the fronter from here to:
-                # retireve URLS with get_tbd_url(), add new URLS to the fornter add_url(), then mark them as completed mark_url_complete()
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            # this is for politeness so it avoids overloading servers with too many requests
-            time.sleep(self.config.time_delay)
+            # True once the url went back to the frontier instead of being completed
+            requeued = False
+            try:
+                # --recrawl: a page fetched recently enough is not downloaded again
+                fresh_links = self.frontier.history.fresh_links(tbd_url)
+                if fresh_links is not None:
+                    self.frontier.add_urls(fresh_links, parent=tbd_url)
+                    continue
+                # download function is form utils/download.py to fetch content of a URL
+                resp = download(
+                    tbd_url, self.config, self.logger,
+                    validators=self.frontier.history.validators(tbd_url))
+                self.logger.info(
+                    f"Downloaded {tbd_url}, status <{resp.status}>, "
+                    f"using cache {self.config.cache_server}.")
+                # the host is failing, try the url again once it had some rest
+                if resp.retry_after is not None:
+                    requeued = self.frontier.retry_url(tbd_url, resp.retry_after)
+                    if requeued:
+                        self.logger.warning(f"Retrying {tbd_url} in {resp.retry_after:.1f}s.")
+                        continue
+                # the host stopped responding, its urls are left for the next run
+                if resp.host_dead:
+                    self.frontier.park_url(tbd_url)
+                    requeued = True
+                    continue
+                # keep the response to try scraper changes on it later (replay.py)
+                if self.frontier.archive is not None:
+                    self.frontier.archive.append(tbd_url, resp)
+                # passes the downloaded information to the scraper function to get new links
+                # this is what we are implementing. pages unchanged since the last crawl
+                # give back their recorded links instead (see crawler/recrawl.py)
+                scraped_urls = self.frontier.history.scrape(tbd_url, resp, scraper.scraper)
+                # utilizes the fronter from here to:
+                    # retireve URLS with get_tbd_url(), add new URLS to the fornter add_url(), then mark them as completed mark_url_complete()
+                self.frontier.add_urls(scraped_urls, parent=tbd_url, resp=resp)
+            except Exception as e:
+                self.logger.error(f"Failed to process {tbd_url}: {e}")
+            finally:
+                # always mark it (unless it went back in the queue), otherwise the frontier
+                # thinks it is still in flight and the other workers never see the end of the crawl
+                if not requeued:
+                    self.frontier.mark_url_complete(tbd_url)
+            # no sleep here, politeness is enforced per host by the frontier's get_tbd_url
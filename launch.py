@@ -2,28 +2,63 @@ from configparser import ConfigParser
 from argparse import ArgumentParser
 
 from utils.server_registration import get_cache_server
+from utils.local_cache import start_local_cache
 from utils.config import Config
 from crawler import Crawler
+from scraper_utils.parsers import set_backend
+from utils import canonical
 
 from scraper import save_to_shelve, show_result
 
 
-def main(config_file, restart):
+def main(config_file, restart, engine="threads", local_cache=False, recrawl=False):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
+    set_backend(config.parser)
+    canonical.configure(config.query, config.strip_params, config.index_files)
+    if recrawl:
+        # a recrawl goes over everything again from the seeds, with the page records of the last crawl
+        assert config.meta_file, "Set METAFILE in config.ini to recrawl"
+        config.recrawl = True
+        restart = True
+    if local_cache:
+        # offline run against utils/local_cache.py, no registration needed
+        config.cache_server = start_local_cache(config)
+    else:
+        config.cache_server = get_cache_server(config, restart)
     # config.cache_server = None
-    crawler = Crawler(config, restart)
+    if engine == "asyncio":
+        # imported here so aiohttp is only needed for this engine
+        try:
+            from crawler.async_engine import AsyncCrawler
+        except ModuleNotFoundError as error:
+            if error.name != "aiohttp":
+                raise
+            raise SystemExit("--engine asyncio needs aiohttp: python -m pip install aiohttp")
+        crawler = AsyncCrawler(config, restart)
+    elif engine == "pipeline":
+        from crawler.pipeline import PipelineCrawler
+        crawler = PipelineCrawler(config, restart)
+    else:
+        crawler = Crawler(config, restart)
     crawler.start()
     
-    # Save scraping results after the crawler finishes
-    save_to_shelve("scraper_results")
-    show_result()
+    # Save scraping results after the crawler finishes. a recrawl only counts new
+    # and changed pages, so it keeps the report of the full crawl
+    if config.recrawl:
+        save_to_shelve("recrawl_results")
+        show_result("recrawl_results", "recrawl_output.txt")
+    else:
+        save_to_shelve("scraper_results")
+        show_result()
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--engine", choices=["threads", "asyncio", "pipeline"], default="threads")
+    parser.add_argument("--local-cache", action="store_true", default=False)
+    parser.add_argument("--recrawl", action="store_true", default=False)
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.engine, args.local_cache, args.recrawl)
@@ -0,0 +1,104 @@
+import time
+import multiprocessing
+from collections import deque
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from concurrent.futures import ProcessPoolExecutor
+
+import scraper
+from crawler.archive import ArchiveReader, decode_record
+from scraper import save_to_shelve, show_result
+from scraper_utils.parsers import BACKENDS, set_backend
+from utils import canonical
+from utils.config import Config
+
+'''
+runs the responses of an ARCHIVE (see crawler/archive.py) through the scraper
+again, without downloading anything, to see what a change to scraper.py does
+to a real crawl:
+    python3 replay.py --archive responses.archive
+parse_page runs on every core in batches of records, merge_page applies them
+in fetch order in this process, which is exactly scraper.scraper on the same
+responses. the parser and the url canonicalization come from the config file
+of the crawl (--config_file), so the links are counted the same way. the results
+are saved like launch.py does, under replay_results by default so the ones of
+the real crawl stay
+'''
+
+BATCH = 64
+
+
+# the parser processes do not share the module globals of this one
+def init_parser(parser, canonical_settings):
+    set_backend(parser)
+    canonical.configure(**canonical_settings)
+
+
+# runs in the parser processes
+def parse_batch(payloads):
+    parsed = list()
+    for payload in payloads:
+        url, resp = decode_record(payload)
+        parsed.append((url, scraper.parse_page(url, resp)))
+    return parsed
+
+
+def batches(payloads):
+    batch = list()
+    for payload in payloads:
+        batch.append(payload)
+        if len(batch) == BATCH:
+            yield batch
+            batch = list()
+    if batch:
+        yield batch
+
+
+# parsed batches in archive order, at most 2 batches per process read ahead
+def parse_all(reader, processes, parser):
+    if processes == 1:
+        for batch in batches(reader.payloads()):
+            yield parse_batch(batch)
+        return
+    with ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_parser, initargs=(parser, canonical.settings())) as pool:
+        pending = deque()
+        for batch in batches(reader.payloads()):
+            pending.append(pool.submit(parse_batch, batch))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(archive, processes, results, config_file="config.ini", parser=None):
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    config = Config(cparser)
+    parser = parser or config.parser
+    set_backend(parser)
+    canonical.configure(config.query, config.strip_params, config.index_files)
+    reader = ArchiveReader(archive)
+    started = time.monotonic()
+    pages = 0
+    for parsed in parse_all(reader, processes or multiprocessing.cpu_count(), parser):
+        for url, page in parsed:
+            scraper.merge_page(url, page)
+            pages += 1
+    elapsed = time.monotonic() - started
+    print(f"Replayed {pages} responses in {elapsed:.1f}s ({pages / max(elapsed, 1e-9):.0f} pages/s).")
+    save_to_shelve(results)
+    show_result(results, f"{results}.txt")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--archive", type=str, default="responses.archive")
+    parser.add_argument("--processes", type=int, default=0)
+    parser.add_argument("--results", type=str, default="replay_results")
+    parser.add_argument("--config_file", type=str, default="config.ini")
+    # PARSER of the config file when not given
+    parser.add_argument("--parser", choices=sorted(BACKENDS), default=None)
+    args = parser.parse_args()
+    main(args.archive, args.processes, args.results, args.config_file, args.parser)
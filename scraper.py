@@ -1,18 +1,19 @@
-import re
-from bs4 import BeautifulSoup
+import threading
 import shelve
-import io
-import PyPDF2
-import PyPDF2.errors
-from urllib.parse import urlparse, urljoin
-from utils import get_logger, normalize
+from urllib.parse import urlparse
+from utils import get_logger
+from utils.canonical import canonicalize
 from collections import defaultdict  # change dict usage
 
 # scraper_util dependendacies
-from scraper_utils.fingerprint import get_fp
 from scraper_utils.similarity import is_similar_to_visited
 from scraper_utils.tokenizer import tokenize
-from scraper_utils.answers import track_subdomains, update_top50_words
+from scraper_utils.answers import track_subdomains, add_word_counts
+from scraper_utils.parsed_page import ParsedPage
+from scraper_utils.links import iter_links
+from scraper_utils.charset import page_encoding
+from scraper_utils.content_type import classify, PARSEABLE
+from scraper_utils.url_filter import rejection, filter_urls
 
 scrap_logger = get_logger("SCRAPPER")
 visited_urls = set()
@@ -24,107 +25,110 @@ longest_page_word_count = 0
 top50words = {}
 subdomain_count = {}
 top50words = {}
+# workers run the scraper in parallel threads, this guards the globals above
+stats_lock = threading.RLock()
 
 
 
 def scraper(url, resp):
-    global longest_page_word_count
-    if resp.status is None or resp.raw_response is None:
-        scrap_logger.warning(f"Skipping URL {url}: Missing response status or raw response")
-        return []
+    return merge_page(url, parse_page(url, resp))
+
+
+# the stateless half of the scraper, it only looks at the response so it can
+# run in a parser process (crawler/pipeline.py). the globals above are only
+# touched by merge_page
+def parse_page(url, resp):
+    '''
+    returns a dict with
+        links       -> the valid links to crawl from this response
+        clean_url   -> the url without its fragment, only for 200 responses
+        word_count, word_freqs, fingerprint -> only for pages parsed as html
+    '''
+    if resp.status is None or resp.content is None:
+        scrap_logger.warning(f"Skipping URL {url}: Missing response status or content")
+        return {"links": []}
         
     if resp.status != 200:
         if resp.status >= 300 and resp.status < 400:
-            redirect_url = resp.raw_response.headers.get("Location")
+            redirect_url = resp.headers.get("Location")
             scrap_logger.warning(f"Status {resp.status}: Redirecting {url} -> {redirect_url}")
-            return [redirect_url] if is_valid(redirect_url) else []
+            return {"links": [redirect_url] if is_valid(redirect_url) else []}
         else:
             scrap_logger.warning(f"Skipping URL {url}: Invalid response or status {resp.status}")
-            return []
-
-    # Parse URL and remove fragment
-    parsed = urlparse(url)
-    clean_url = normalize(parsed._replace(fragment="").geturl())
-    # Prevent cycles by checking visited URLs
-    if clean_url in visited_urls:
-        scrap_logger.info(f"Skipping URL due to cycle: {url}")
-        return []
-    # Add the normalized URL to visited set
-    visited_urls.add(clean_url)
-
-    if is_pdf_resp(url, resp):
-        scrap_logger.warning(f"Skipping {url}: pdf file")
-        return []
-    if is_zip_resp(url, resp):
-        scrap_logger.warning(f"Skipping {url}: zip file")
-        return []
-    if is_attachment_resp(url, resp):
-        scrap_logger.warning(f"Skipping {url}: downloads attachment")
-        return []
-    # Add the is_large_resp check here
-    if is_large_resp(url, resp, threshold=10 * 1024 * 1024):  # 10 MB threshold
-        scrap_logger.warning(f"Skipping {url}: response too large")
-        return []
-
-    # parse as html document
+            return {"links": []}
+
+    # canonical url, without fragment (utils/canonical.py)
+    clean_url = canonicalize(url)
+    page = {"clean_url": clean_url, "links": []}
+
+    # one look at the headers and the first bytes, before anything parses the
+    # body: pdfs, archives, images, attachments, over 10 MB (scraper_utils/content_type.py)
+    kind = classify(resp)
+    if kind not in PARSEABLE:
+        scrap_logger.warning(f"Skipping {url}: {kind} response")
+        return page
+
+    # parse as html document, once: the text, the tokens, the fingerprint and
+    # the links all come from the same ParsedPage
+    parsed_page = ParsedPage(url, resp.content, content_type=resp.headers.get("Content-Type", ""))
     try:
-        # Get the text from the html response
-        soup = BeautifulSoup(resp.raw_response.content, 'html.parser')
-
-        # Remove the text of CSS, JS, metadata, alter for JS, embeded websites
-        for markup in soup.find_all(["style", "script", "meta", "noscript", "iframe"]):
-            markup.decompose()  # remove all markups stated above
-
-        # soup contains only human-readable texts now to be compared near-duplicate
-        text = soup.get_text(separator=" ", strip=True)
+        # human-readable text, to count words and compare near-duplicates
+        page["word_count"] = parsed_page.word_count
+        page["word_freqs"] = parsed_page.word_freqs
+        # create fingerprint from the same tokens
+        page["fingerprint"] = parsed_page.fingerprint
     except Exception as e:
         scrap_logger.fatal(f"Error parsing {url}: {e}")
-
-    track_unique_urls(clean_url, visited_urls)  # changed to pass defragged url
-    print(unique_count)
-    track_subdomains(url, subdomain_count)
-    # soup = BeautifulSoup(resp.raw_response.content, 'html.parser')
-    text = soup.get_text()
-    track_longest_page(url, text)
-    print(longest_page_url)
-    update_top50_words(text, top50words)
-
-    ''' FINGERPRINT CODE STARTS HERE '''
-    # create fingerprint
-    # decode content to string because its a byte
-    page_content = resp.raw_response.content.decode('utf-8', errors='ignore')
-    fingerprint = tuple(get_fp(page_content))
-
-    # then check if the curr page is a near dupe of ANY prev page
-    # if it is a dupe, then we dont add it, so SKIP scrawling the page
-    if is_similar_to_visited(fingerprint, visited_sites_fingerprint, THRESHOLD):
-        print(f"Skipping duplicate page: {url}")
-        return []  # So that we skip crawling when its a dupe/near-dupe
-
-    # If it is not a dupe then add it to the visted set
-    visited_sites_fingerprint.add(fingerprint)
-    ''' FINGERPRINT CODE ENDS HERE '''
+        return {"clean_url": clean_url, "links": []}
 
     # We extract the links, all of them from the page
-    links = extract_next_links(url, resp)
-    # Then just return the links that need to be crawled
-    # return [link for link in links if is_valid(link)]
-    unique_links = set()
-    for link in links:
-        if not link:
-            scrap_logger.info("Filtered out an empty or none URL")
-        elif link in unique_links:
-            scrap_logger.info(f"Filtered out duplicate URL: {link}")
-        elif not is_valid(link):
-            scrap_logger.info(f"Filtered out invalid URL: {link}")
-        else:
-            unique_links.add(link)
+    links = extract_next_links(url, resp, parsed_page)
+    # Then just return the links that need to be crawled, each once
+    page["links"] = filter_urls(links)
+    return page
+
+
+# the stateful half of the scraper: applies what parse_page found to the report
+# statistics and the near-duplicate check, and returns the links to crawl
+def merge_page(url, page):
+    clean_url = page.get("clean_url")
+    if clean_url is None:
+        return page["links"]
+    with stats_lock:
+        # Prevent cycles by checking visited URLs
+        if clean_url in visited_urls:
+            scrap_logger.info(f"Skipping URL due to cycle: {url}")
+            return []
+        # Add the normalized URL to visited set
+        visited_urls.add(clean_url)
+        if "fingerprint" not in page:
+            # not an html page
+            return []
 
-    return list(unique_links)
+        track_unique_urls(clean_url, visited_urls)  # changed to pass defragged url
+        print(unique_count)
+        track_subdomains(url, subdomain_count)
+        track_longest_page(url, page["word_count"])
+        print(longest_page_url)
+        add_word_counts(page["word_freqs"], top50words)
+
+        ''' FINGERPRINT CODE STARTS HERE '''
+        # then check if the curr page is a near dupe of ANY prev page
+        # if it is a dupe, then we dont add it, so SKIP scrawling the page
+        if is_similar_to_visited(page["fingerprint"], visited_sites_fingerprint, THRESHOLD):
+            print(f"Skipping duplicate page: {url}")
+            return []  # So that we skip crawling when its a dupe/near-dupe
+
+        # If it is not a dupe then add it to the visted set
+        visited_sites_fingerprint.add(page["fingerprint"])
+        ''' FINGERPRINT CODE ENDS HERE '''
+
+    return page["links"]
 
 
 # this part is 100% done for sure
-def extract_next_links(url, resp):
+# parsed_page is the ParsedPage of resp when the caller already has one
+def extract_next_links(url, resp, parsed_page=None):
     # Implementation required.
     # url: the URL that was used to get the page
     # resp.url: the actual url of the page
@@ -134,6 +138,7 @@ def extract_next_links(url, resp):
     #         resp.raw_response.url: the url, again
     #         resp.raw_response.content: the content of the page!
     # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
+    # resp.content / resp.headers: the same body and headers, without unpickling all of raw_response
 
     # simple check to see if the status code is OK => if it is NOT 200 (ok) then we need to say why, so we call out reps.error
     if resp.status != 200:
@@ -157,26 +162,19 @@ def extract_next_links(url, resp):
         links.append(link)
     '''
     try:
-        soup = BeautifulSoup(resp.raw_response.content, 'html.parser')
-        for anchor in soup.find_all('a', href=True):
-            link = anchor.get('href')
-
-            # convert relative url to absolute url
-            abs_url = urljoin(url, link)
-            parsed = urlparse(abs_url)
-
-            # remove anyhting that starts iwth # since I keep seeing this and it means nothing
-            clean_url = normalize(parsed._replace(query="", fragment="").geturl())
-
+        # canonical absolute urls (relative to the page or its <base href>),
+        # scanned straight from the bytes (scraper_utils/links.py)
+        if parsed_page is not None:
+            page_links = parsed_page.links
+        else:
+            page_links = iter_links(
+                url, resp.content, page_encoding(resp.content, resp.headers.get("Content-Type", "")))
+        for clean_url in page_links:
             # gitlab and github are bad
             if "gitlab.ics.uci.edu" in clean_url or "github.com" in clean_url:
                 scrap_logger.info(f"Skipping GitLab/GitHub URL: {clean_url}")
                 continue
 
-            if not clean_url:
-                scrap_logger.info("Skipping empty or malformed URL")
-                continue
-
             # print(f"Found link: {clean_url}")
             links.append(clean_url)
 
@@ -189,72 +187,11 @@ def extract_next_links(url, resp):
 def is_valid(url):
     # Decide whether to crawl this url or not.
     # If you decide to crawl it, return True; otherwise return False.
-    try:
-        # Break the URL into parts: scheme, netloc, path, query, etc.
-        parsed = urlparse(url)
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-
-        # Check if it is within the allowed domains
-        domain = parsed.netloc.lower()
-        path = parsed.path.lower()
-        query = parsed.query.lower()
-        # -----------------------------------EXLCUSION LINKS  FOR TRAPS OVER HERE-----------------------------------------------
-        # Exclude GitLab and GitHub links
-        if "gitlab.ics.uci.edu" in domain or "github.com" in domain:
-            scrap_logger.info(f"Skipping github/gitlab URL: {url}")
-            return False
-        # Exclude calendar and event-related URLs
-        if "/events_calendar" in path or "/calendar" in path or "/events" in path or "date=" in query or "year=" in query or "month=" in query:
-            scrap_logger.info(f"Skipping calendar/event URL: {url}")
-            return False
-        # exclude all the unecsseary images from eppestein (takes forever to load and they are all the same anyways)
-        if "~eppestein" in domain and "/pix/" in path:
-            scrap_logger.info(f"Skipping /pix/ URL: {url}")
-            return False
-        # Avoid infinite trap pattern and identifier segment
-        MAX_DEPTH = 8
-        MAX_SEGMENT_LENGTH = 20
-
-        # Split the URL path into segments
-        path_segments = [segment for segment in parsed.path.split('/') if segment]
-
-        # Check depth and segment length in one loop
-        for i, segment in enumerate(path_segments):
-            if i > MAX_DEPTH:  # Check for path depth
-                return False
-            if segment.isalnum() and len(segment) > MAX_SEGMENT_LENGTH:  # Check for long alphanumeric segments
-                return False
-
-        # Rule for links
-        valid_domains = [
-            "ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"
-        ]
-        today_uci_path = "/department/information_computer_sciences/"
-        # Allow any subdomain of the 4 domains
-        if any(domain.endswith(d) for d in valid_domains):
-            return not re.match(
-                r".*\.(css|js|bmp|gif|jpe?g|ico"
-                + r"|png|tiff?|mid|mp2|mp3|mp4"
-                + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-                + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-                + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-                + r"|epub|dll|cnf|tgz|sha1"
-                + r"|thmx|mso|arff|rtf|jar|csv"
-                + r"|rm|smil|wmv|swf|wma|zip|rar|gz"
-                + r"|img|java|war|sql|mpg|ff|sh|ppsx|py|apk|svg|conf|cpp|fig|cls|ipynb|bam|odp|odc|tsv|nb|bib|z|rpm|ma)$",
-                parsed.path.lower())
-
-        # Case for today.uci.edu since we only accept this specific path
-        if domain == "today.uci.edu" and path.startswith(today_uci_path):
-            return True
-
-        # True conditions weren't triggered so we exit
-        return False
-
-    except TypeError:
-        print("TypeError for ", parsed)
-        raise
+    # the rules are compiled once in scraper_utils/url_filter.py
+    reason = rejection(url)
+    if reason in ("github/gitlab", "calendar/event", "/pix/"):
+        scrap_logger.info(f"Skipping {reason} URL: {url}")
+    return reason is None
 
 
 # for report --------------------------------------------------
@@ -265,10 +202,8 @@ def track_unique_urls(url, visited_urls):
     global unique_count
     unique_count = len(visited_urls)
 
-def track_longest_page(url, text):
+def track_longest_page(url, word_count):
     """Track the longest page in terms of word count."""
-    words = text.split()
-    word_count = len(words)
     global longest_page_word_count, longest_page_url
     if word_count > longest_page_word_count:
         longest_page_url = url
@@ -346,65 +281,3 @@ def show_result(filename="scraper_results", output_file="scraper_output.txt"):
                 line = f"{subdomain}: {count}"
                 f.write(line + "\n")
                 print(line)
-
-
-def is_pdf_resp(url, resp):
-    content_type = resp.raw_response.headers.get("Content-Type", "").lower()
-
-    # First, check Content-Type header
-    if "application/pdf" in content_type:
-        return True
-
-    try:
-        with io.BytesIO(resp.raw_response.content) as pdf_stream:
-            start = pdf_stream.read(5)
-            if start != b"%PDF-":
-                return False  # Definitely not a PDF
-
-            # Reset pointer to beginning
-            pdf_stream.seek(0)
-
-            reader = PyPDF2.PdfReader(pdf_stream)
-            return bool(reader.pages)
-    except Exception:
-        return False
-
-
-def is_zip_resp(url, resp):
-    content_type = resp.raw_response.headers.get("Content-Type", "").lower()
-
-    if "application/zip" == content_type:
-        return True
-
-    return False
-
-
-def is_html_resp(url, resp):
-    content_type = resp.raw_response.headers.get("Content-Type", "").lower()
-
-    if content_type.startswith("text/html"):
-        return True
-
-    return False
-
-
-def is_attachment_resp(url, resp):
-    content_disposition = resp.raw_response.headers.get("Content-Disposition", "").lower()
-
-    if "attachment" in content_disposition:
-        return True
-
-    return False
-
-
-def is_large_resp(url, resp, threshold):
-    content_length = resp.raw_response.headers.get("Content-Length", "")
-
-    try:
-        content_length = int(content_length)
-        if content_length > threshold:
-            return True
-    except:
-        return False
-
-    return False
\ No newline at end of file
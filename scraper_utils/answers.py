@@ -49,10 +49,27 @@ def track_subdomains(url, subdomain_count):
         
 def update_top50_words(text, top50words):
     """Update the top 50 words."""
-    words = tokenize(text)
-    for word in words:
+    add_word_counts(count_words(text), top50words)
+
+def count_words(text):
+    """Count the words of one page."""
+    return count_tokens(tokenize(text))
+
+def count_tokens(tokens):
+    """Count the words of one already tokenized page."""
+    word_counts = {}
+    for word in tokens:
         word = word.lower()
+        if word in word_counts:
+            word_counts[word] += 1
+        else:
+            word_counts[word] = 1
+    return word_counts
+
+def add_word_counts(word_counts, top50words):
+    """Add the word counts of one page to the running totals."""
+    for word, count in word_counts.items():
         if word in top50words:
-            top50words[word] += 1
+            top50words[word] += count
         else:
-            top50words[word] = 1
+            top50words[word] = count
@@ -0,0 +1,54 @@
+import re
+import codecs
+
+'''
+the encoding of a page, for the code that reads its bytes (the streaming parser
+and the link scan). it is guessed in the order a browser, and bs4, goes:
+    BOM             -> utf-8 or utf-16
+    Content-Type    -> the charset of the header
+    <meta>          -> <meta charset> or the http-equiv Content-Type, in the
+                       first 1024 bytes like html5 says
+    utf-8           -> when the bytes are valid utf-8
+    windows-1252    -> otherwise, it decodes every byte
+'''
+
+DEFAULT = "windows-1252"
+
+_CHARSET = re.compile(rb"""charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+_META_CHARSET = re.compile(rb"""<meta[^>]*?charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+_META_SNIFF = 1024
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+
+# the python name of a declared charset, None when python does not know it.
+# a page written in utf-16 could not have declared it in ascii
+def _codec(name):
+    try:
+        encoding = codecs.lookup(name.decode("ascii")).name
+    except (LookupError, UnicodeDecodeError):
+        return None
+    return None if encoding.startswith("utf-16") else encoding
+
+
+def page_encoding(content, content_type=""):
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+    match = _CHARSET.search(content_type.encode("latin-1", errors="replace"))
+    encoding = _codec(match.group(1)) if match is not None else None
+    if encoding is not None:
+        return encoding
+    match = _META_CHARSET.search(content, 0, _META_SNIFF)
+    encoding = _codec(match.group(1)) if match is not None else None
+    if encoding is not None:
+        return encoding
+    try:
+        content.decode("utf-8")
+    except UnicodeDecodeError:
+        return DEFAULT
+    return "utf-8"
+
+
+def decode_page(content, content_type=""):
+    return content.decode(page_encoding(content, content_type), errors="replace")
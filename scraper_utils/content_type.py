@@ -0,0 +1,130 @@
+'''
+what a 200 response holds, decided from its headers and the first SNIFF bytes
+of the body before anything parses it. classify(resp) returns one verdict
+    html, text                -> parsed by the scraper
+    pdf, archive, image,
+    office, binary            -> skipped, from the magic bytes at the start of the
+                                 body, else from the Content-Type header, else a
+                                 body with NUL bytes is binary
+    attachment, large         -> skipped from the headers alone
+the magic bytes win over the header, servers send pdfs and zips as text/html
+'''
+
+HTML = "html"
+TEXT = "text"
+PDF = "pdf"
+ARCHIVE = "archive"
+IMAGE = "image"
+OFFICE = "office"
+BINARY = "binary"
+ATTACHMENT = "attachment"
+LARGE = "large"
+
+# the verdicts the scraper parses as a page
+PARSEABLE = frozenset((HTML, TEXT))
+
+SNIFF = 512
+MAX_SIZE = 10 * 1024 * 1024
+
+_MAGIC = (
+    (b"%PDF-", PDF),
+    (b"PK\x03\x04", ARCHIVE),
+    (b"PK\x05\x06", ARCHIVE),
+    (b"\x1f\x8b", ARCHIVE),
+    (b"BZh", ARCHIVE),
+    (b"\xfd7zXZ\x00", ARCHIVE),
+    (b"7z\xbc\xaf\x27\x1c", ARCHIVE),
+    (b"Rar!\x1a\x07", ARCHIVE),
+    (b"\x89PNG\r\n\x1a\n", IMAGE),
+    (b"\xff\xd8\xff", IMAGE),
+    (b"GIF87a", IMAGE),
+    (b"GIF89a", IMAGE),
+    (b"II*\x00", IMAGE),
+    (b"MM\x00*", IMAGE),
+    (b"\x00\x00\x01\x00", IMAGE),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", OFFICE),
+    (b"{\\rtf", OFFICE),
+    (b"\x7fELF", BINARY),
+    (b"\xca\xfe\xba\xbe", BINARY),
+    (b"ID3", BINARY),
+    (b"OggS", BINARY),
+    (b"fLaC", BINARY),
+    (b"\x1aE\xdf\xa3", BINARY),
+    (b"wOFF", BINARY),
+    (b"wOF2", BINARY),
+)
+
+# a zip whose first entry names the document inside, docx / xlsx / pptx / odt
+_OFFICE_ZIP = (b"[Content_Types].xml", b"mimetypeapplication/vnd.oasis")
+
+# Content-Type prefixes, checked in order
+_TYPES = (
+    ("text/html", HTML),
+    ("application/xhtml+xml", HTML),
+    ("text/", TEXT),
+    ("application/pdf", PDF),
+    ("image/", IMAGE),
+    ("audio/", BINARY),
+    ("video/", BINARY),
+    ("font/", BINARY),
+    ("application/msword", OFFICE),
+    ("application/vnd.ms-", OFFICE),
+    ("application/vnd.openxmlformats", OFFICE),
+    ("application/vnd.oasis", OFFICE),
+    ("application/zip", ARCHIVE),
+    ("application/gzip", ARCHIVE),
+    ("application/x-gzip", ARCHIVE),
+    ("application/x-tar", ARCHIVE),
+    ("application/x-7z", ARCHIVE),
+    ("application/x-rar", ARCHIVE),
+    ("application/x-bzip", ARCHIVE),
+    ("application/vnd.rar", ARCHIVE),
+)
+
+
+def _from_magic(head):
+    for magic, verdict in _MAGIC:
+        if head.startswith(magic):
+            if magic == b"PK\x03\x04" and any(name in head[30:90] for name in _OFFICE_ZIP):
+                return OFFICE
+            return verdict
+    if head[:4] == b"RIFF":
+        # webp, else wav or avi
+        return IMAGE if head[8:12] == b"WEBP" else BINARY
+    return None
+
+
+def _from_header(content_type):
+    for prefix, verdict in _TYPES:
+        if content_type.startswith(prefix):
+            return verdict
+    return None
+
+
+def _size(headers, content):
+    try:
+        length = int(headers.get("Content-Length", ""))
+    except ValueError:
+        length = 0
+    return max(length, len(content))
+
+
+def classify(resp):
+    headers = resp.headers
+    if "attachment" in headers.get("Content-Disposition", "").lower():
+        return ATTACHMENT
+    content = resp.content or b""
+    if _size(headers, content) > MAX_SIZE:
+        return LARGE
+    head = content[:SNIFF]
+    verdict = _from_magic(head)
+    if verdict is not None:
+        return verdict
+    verdict = _from_header(headers.get("Content-Type", "").lower().lstrip())
+    if verdict is not None:
+        return verdict
+    # no or an unknown Content-Type, like application/octet-stream
+    if b"\x00" in head:
+        return BINARY
+    stripped = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    return HTML if stripped.startswith(b"<") else TEXT
@@ -5,7 +5,9 @@ from .tokenizer import tokenize
 # for each page, we need to create a dictionary for {key: the page, value: fingerprint value}
 
 def three_gram(text):
-    words = tokenize(text)
+    return three_gram_tokens(tokenize(text))
+
+def three_gram_tokens(words):
     three_grams = []
 
     for i in range(len(words)-2):
@@ -22,7 +24,11 @@ def select_hash(hashes, k=50):
 
 # put all 3 processes together to create the fingerprint
 def get_fp(text):
-    three_grams = three_gram(text)
+    return get_fp_from_tokens(tokenize(text))
+
+# same, for a page that is already tokenized (scraper_utils/parsed_page.py)
+def get_fp_from_tokens(tokens):
+    three_grams = three_gram_tokens(tokens)
     hashes = [hash_value(g) for g in three_grams]
     fingerprint = select_hash(hashes)
     return fingerprint
\ No newline at end of file
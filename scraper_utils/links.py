@@ -0,0 +1,114 @@
+import re
+from html import unescape
+from urllib.parse import urljoin
+
+from utils.canonical import canonicalize
+from scraper_utils.charset import page_encoding
+
+'''
+link extraction straight from the bytes of a page, without a tree. one forward
+scan over the page meets, in document order,
+    comments and <script> / <style> blocks -> skipped, like an html parser does
+    <base href=...>                        -> the first one becomes the url the
+                                              links are relative to
+    <a href=...>                           -> yielded as an absolute url
+the attribute values are decoded with the charset of the page, unescaped
+(&amp;) and trimmed the way browsers do. like html.parser, a quote only opens
+a value right after its =, a stray one is part of the text, and a value that
+is never closed ends at the next >. the scan never goes back: an unclosed
+comment, script or style takes the rest of the page with it, so broken markup
+stays linear
+'''
+
+_OPEN = re.compile(rb"<(?:(!--)|(script|style)\b|(a|base)\b)", re.IGNORECASE)
+_CLOSE = {
+    b"script": re.compile(rb"</script\s*>", re.IGNORECASE),
+    b"style": re.compile(rb"</style\s*>", re.IGNORECASE),
+}
+# the end of the tag, or a quote opening an attribute value
+_TAG_END = re.compile(rb"""=\s*(["'])|>""")
+
+_HREF = re.compile(
+    rb"""(?:^|[\s/])href\s*=\s*(?:"([^"]*)"|'([^']*)'|["']?([^\s>]+))""",
+    re.IGNORECASE)
+
+
+# the position of the > that ends the tag whose attributes start at pos, -1
+# when the page ends first. unclosed holds the quotes with no match left in
+# the page, so each of them is only searched for once
+def _tag_end(content, pos, unclosed):
+    while True:
+        match = _TAG_END.search(content, pos)
+        if match is None:
+            return -1
+        quote = match.group(1)
+        if quote is None:
+            return match.start()
+        close = -1 if quote in unclosed else content.find(quote, match.end())
+        if close < 0:
+            # a value that is never closed ends at the next >
+            unclosed.add(quote)
+            return content.find(b">", match.end())
+        pos = close + 1
+
+
+# (tag, attributes) of every <a> and <base> outside comments, scripts and styles
+def _tags(content):
+    pos = 0
+    unclosed = set()
+    while True:
+        match = _OPEN.search(content, pos)
+        if match is None:
+            return
+        if match.group(1):
+            pos = content.find(b"-->", match.end())
+            if pos < 0:
+                return
+            pos += 3
+        elif match.group(2):
+            close = _CLOSE[match.group(2).lower()].search(content, match.end())
+            if close is None:
+                return
+            pos = close.end()
+        else:
+            end = _tag_end(content, match.end(), unclosed)
+            if end < 0:
+                return
+            yield match.group(3).lower(), content[match.end():end]
+            pos = end + 1
+
+
+def _href(attrs, encoding):
+    match = _HREF.search(attrs)
+    if match is None:
+        return None
+    value = match.group(1)
+    if value is None:
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+    href = value.decode(encoding, errors="replace")
+    if "&" in href:
+        href = unescape(href)
+    return href.strip()
+
+
+# every href of an <a>, resolved against the page url or its <base href>.
+# encoding is the one of the page, guessed from its bytes when not given
+def iter_hrefs(url, content, encoding=None):
+    encoding = encoding or page_encoding(content)
+    base, base_seen = url, False
+    for tag, attrs in _tags(content):
+        href = _href(attrs, encoding)
+        if href is None:
+            continue
+        if tag == b"a":
+            yield urljoin(base, href)
+        elif not base_seen:
+            base, base_seen = urljoin(url, href), True
+
+
+# canonical urls of the links of a page, as the scraper crawls them (utils/canonical.py)
+def iter_links(url, content, encoding=None):
+    for absolute in iter_hrefs(url, content, encoding):
+        clean_url = canonicalize(absolute)
+        if clean_url:
+            yield clean_url
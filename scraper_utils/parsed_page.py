@@ -0,0 +1,61 @@
+from functools import cached_property
+
+from scraper_utils.tokenizer import tokenize
+from scraper_utils.fingerprint import get_fp_from_tokens
+from scraper_utils.answers import count_tokens
+from scraper_utils.parsers import get_backend
+from scraper_utils.links import iter_links
+from scraper_utils.charset import page_encoding
+
+
+class ParsedPage(object):
+    '''
+    one html response, parsed once. every stage of the scraper reads from here
+    and each property is worked out the first time it is asked for
+        document    -> the page parsed by the PARSER backend (scraper_utils/parsers.py)
+        encoding    -> the charset of the page, from its Content-Type header
+                       or its bytes (scraper_utils/charset.py)
+        links       -> the absolute urls the scraper crawls, scanned from the
+                       bytes without the document (scraper_utils/links.py)
+        text        -> the human readable text, without the HIDDEN_TAGS
+        tokens      -> tokenize(text)
+        word_count, word_freqs, fingerprint -> what the report and the
+                       near-duplicate check need, all from the same tokens
+    '''
+    def __init__(self, url, content, backend=None, content_type=""):
+        self.url = url
+        self.content = content
+        self.backend = backend or get_backend()
+        self.content_type = content_type
+
+    @cached_property
+    def document(self):
+        return self.backend.parse(self.content)
+
+    @cached_property
+    def encoding(self):
+        return page_encoding(self.content, self.content_type)
+
+    @cached_property
+    def links(self):
+        return list(iter_links(self.url, self.content, self.encoding))
+
+    @cached_property
+    def text(self):
+        return self.backend.text(self.document)
+
+    @cached_property
+    def tokens(self):
+        return tokenize(self.text)
+
+    @cached_property
+    def word_count(self):
+        return len(self.text.split())
+
+    @cached_property
+    def word_freqs(self):
+        return count_tokens(self.tokens)
+
+    @cached_property
+    def fingerprint(self):
+        return tuple(get_fp_from_tokens(self.tokens))
@@ -0,0 +1,95 @@
+import time
+from argparse import ArgumentParser
+
+from scraper_utils.parsers import BACKENDS
+from scraper_utils.parsed_page import ParsedPage
+
+'''
+pages per second of every PARSER backend on the same pages:
+    python3 -m scraper_utils.parser_benchmark --archive <ARCHIVE>
+    python3 -m scraper_utils.parser_benchmark --corpus <CORPUS>
+    python3 -m scraper_utils.parser_benchmark --synthetic 2000
+a page is parsed the way the scraper does it: links, text, tokens and
+fingerprint. the pages whose text differs from bs4 are counted too, a faster
+backend is only worth it if the report stays the same
+'''
+
+
+def archive_pages(directory, limit):
+    from crawler.archive import ArchiveReader
+    pages = list()
+    for url, resp in ArchiveReader(directory):
+        if resp.status == 200 and resp.content:
+            pages.append((url, resp.content))
+            if len(pages) >= limit:
+                break
+    return pages
+
+
+def corpus_pages(directory, limit):
+    from utils.local_cache import CorpusSource
+    source = CorpusSource(directory)
+    pages = list()
+    for url in list(source.pages)[:limit]:
+        status, _, body = source.page(url)
+        if status == 200 and body:
+            pages.append((url, body))
+    return pages
+
+
+def synthetic_pages(count):
+    from utils.local_cache import SyntheticSource
+    source = SyntheticSource(["https://www.ics.uci.edu"], hosts=1, pages=count)
+    return [
+        (url, source.page(url)[2])
+        for url in (f"https://www.ics.uci.edu/page/{i}" for i in range(count))]
+
+
+def parse(url, content, backend):
+    page = ParsedPage(url, content, backend)
+    page.links
+    page.fingerprint
+    return page.text
+
+
+def run(pages, names, repeat):
+    size = sum(len(content) for _, content in pages)
+    print(f"{len(pages)} pages, {size / 1024 / 1024:.1f} MB")
+    reference = None
+    for name in names:
+        try:
+            backend = BACKENDS[name]()
+        except ImportError as e:
+            print(f"{name:>10}: not installed ({e})")
+            continue
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = [parse(url, content, backend) for url, content in pages]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        if reference is None:
+            reference = results
+        differ = sum(1 for mine, theirs in zip(results, reference) if mine != theirs)
+        print(
+            f"{name:>10}: {len(pages) / best:8.1f} pages/s  "
+            f"{size / 1024 / 1024 / best:6.2f} MB/s  "
+            f"{differ} pages differ from {names[0]}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--archive", type=str, default=None)
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--synthetic", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if args.archive:
+        pages = archive_pages(args.archive, args.limit)
+    elif args.corpus:
+        pages = corpus_pages(args.corpus, args.limit)
+    else:
+        pages = synthetic_pages(args.synthetic)
+    # bs4 first, it is what the others are compared to
+    run(pages, ["bs4"] + [name for name in BACKENDS if name != "bs4"], args.repeat)
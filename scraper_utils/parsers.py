@@ -0,0 +1,123 @@
+from html.parser import HTMLParser
+
+from scraper_utils.charset import decode_page, page_encoding
+
+'''
+html parser backends behind scraper_utils/parsed_page.py, picked with PARSER in
+config.ini. a backend turns the bytes of a page into a document and reads
+    text(document) -> the human readable text without the HIDDEN_TAGS, one
+                      space between the strings
+the links do not need a backend, scraper_utils/links.py scans them from the bytes
+    bs4       -> BeautifulSoup with html.parser, pure python and the slowest
+    lxml      -> lxml.html, a C parser (python -m pip install lxml)
+    streaming -> html.parser events, collects the text in one pass without
+                 building a tree. the bytes are decoded the way bs4 guesses
+                 them (scraper_utils/charset.py)
+python3 -m scraper_utils.parser_benchmark compares them on the same pages
+'''
+
+# markup whose text is not part of the page: CSS, JS, metadata, alternatives for JS, embedded websites
+HIDDEN_TAGS = ["style", "script", "meta", "noscript", "iframe"]
+
+
+class Bs4Backend(object):
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self.BeautifulSoup = BeautifulSoup
+
+    def parse(self, content):
+        return self.BeautifulSoup(content, 'html.parser')
+
+    def text(self, soup):
+        for markup in soup.find_all(HIDDEN_TAGS):
+            markup.decompose()
+        return soup.get_text(separator=" ", strip=True)
+
+
+class LxmlBackend(object):
+    def __init__(self):
+        # only needed when this backend is picked
+        import lxml.html
+        import lxml.etree
+        self.html = lxml.html
+        self.etree = lxml.etree
+        # encoding -> parser, lxml reads bytes without a <meta> charset as latin-1
+        self.parsers = dict()
+
+    def parse(self, content):
+        encoding = page_encoding(content)
+        parser = self.parsers.get(encoding)
+        if parser is None:
+            parser = self.parsers[encoding] = self.html.HTMLParser(encoding=encoding)
+        try:
+            return self.html.fromstring(content, parser=parser)
+        except (self.etree.ParserError, ValueError):
+            # empty or whitespace only page
+            return self.html.fromstring("<html></html>")
+
+    def text(self, document):
+        # emptied and not removed, so the text after them stays a string of its
+        # own like with bs4, instead of being glued to the text before them
+        for markup in list(document.iter(self.etree.Comment, *HIDDEN_TAGS)):
+            markup.clear(keep_tail=True)
+        strings = (string.strip() for string in document.itertext())
+        return " ".join(string for string in strings if string)
+
+
+class _StreamingDocument(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.strings = list()
+        # depth inside HIDDEN_TAGS, their text is skipped
+        self.hidden = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HIDDEN_TAGS and tag != "meta":
+            # meta has no end tag and no text
+            self.hidden += 1
+
+    def handle_endtag(self, tag):
+        if tag in HIDDEN_TAGS and tag != "meta" and self.hidden:
+            self.hidden -= 1
+
+    def handle_data(self, data):
+        if not self.hidden:
+            data = data.strip()
+            if data:
+                self.strings.append(data)
+
+
+class StreamingBackend(object):
+    def parse(self, content):
+        document = _StreamingDocument()
+        document.feed(decode_page(content))
+        document.close()
+        return document
+
+    def text(self, document):
+        return " ".join(document.strings)
+
+
+BACKENDS = {
+    "bs4": Bs4Backend,
+    "lxml": LxmlBackend,
+    "streaming": StreamingBackend,
+}
+
+_backend = None
+_backend_name = "bs4"
+
+
+# picks the backend every ParsedPage uses from now on. the parser processes of
+# --engine pipeline call it too, since they do not share the module globals
+def set_backend(name):
+    global _backend, _backend_name
+    _backend = BACKENDS[name]()
+    _backend_name = name
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS[_backend_name]()
+    return _backend
@@ -0,0 +1,104 @@
+import re
+from functools import lru_cache
+from urllib.parse import urlparse, urlsplit
+
+'''
+the rules of scraper.is_valid, built once when the module is imported instead of
+on every call. a url is rejected, in this order, for
+    scheme         -> not http or https
+    github/gitlab  -> gitlab.ics.uci.edu or github.com anywhere in the netloc
+    calendar/event -> /calendar or /events in the path, date=, year= or month=
+                      in the query (plain substring checks beat a compiled
+                      alternation here)
+    /pix/          -> the pictures of ~eppestein
+    depth          -> more than MAX_DEPTH + 1 path segments
+    segment        -> an alphanumeric path segment longer than MAX_SEGMENT_LENGTH
+    extension      -> a file extension of EXTENSIONS on an allowed domain
+    domain         -> a netloc that does not end with one of VALID_DOMAINS, except
+                      for TODAY_UCI_PATH on today.uci.edu
+the allowed domains are a plain suffix match of the lowercased netloc, like
+the original any(domain.endswith(d)), so physics.uci.edu is in and a netloc
+with a port is out. the last MEMO_SIZE answers are memoized, the same links
+show up on almost every page of a site
+'''
+
+VALID_DOMAINS = ("ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu")
+TODAY_UCI_HOST = "today.uci.edu"
+TODAY_UCI_PATH = "/department/information_computer_sciences/"
+
+MAX_DEPTH = 8
+MAX_SEGMENT_LENGTH = 20
+MEMO_SIZE = 1 << 16
+
+EXTENSIONS = frozenset((
+    "css", "js", "bmp", "gif", "jpg", "jpeg", "ico",
+    "png", "tif", "tiff", "mid", "mp2", "mp3", "mp4",
+    "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv", "ogg", "ogv", "pdf",
+    "ps", "eps", "tex", "ppt", "pptx", "doc", "docx", "xls", "xlsx", "names",
+    "data", "dat", "exe", "bz2", "tar", "msi", "bin", "7z", "psd", "dmg", "iso",
+    "epub", "dll", "cnf", "tgz", "sha1",
+    "thmx", "mso", "arff", "rtf", "jar", "csv",
+    "rm", "smil", "wmv", "swf", "wma", "zip", "rar", "gz",
+    "img", "java", "war", "sql", "mpg", "ff", "sh", "ppsx", "py", "apk", "svg", "conf",
+    "cpp", "fig", "cls", "ipynb", "bam", "odp", "odc", "tsv", "nb", "bib", "z", "rpm", "ma"))
+
+# the original pattern, only for paths with a newline, where "." and "$" of the
+# regex do not simply mean "the text after the last dot"
+_EXTENSION = re.compile(r".*\.(" + "|".join(sorted(EXTENSIONS)) + r")$")
+
+
+def _has_extension(path):
+    if "\n" in path:
+        return _EXTENSION.match(path) is not None
+    _, dot, extension = path.rpartition(".")
+    return bool(dot) and extension in EXTENSIONS
+
+
+# why a url is not crawled, None when it is
+@lru_cache(maxsize=MEMO_SIZE)
+def rejection(url):
+    parsed = urlsplit(url)
+    if parsed.scheme != "http" and parsed.scheme != "https":
+        return "scheme"
+    # urlsplit is urlparse without the ;params of the last segment, which
+    # urlparse leaves out of the path
+    raw_path = parsed.path if ";" not in parsed.path else urlparse(url).path
+    domain = parsed.netloc.lower()
+    path = raw_path.lower()
+    if "gitlab.ics.uci.edu" in domain or "github.com" in domain:
+        return "github/gitlab"
+    # "/events_calendar" is covered by both path checks
+    if "/calendar" in path or "/events" in path:
+        return "calendar/event"
+    query = parsed.query.lower()
+    if "date=" in query or "year=" in query or "month=" in query:
+        return "calendar/event"
+    if "~eppestein" in domain and "/pix/" in path:
+        return "/pix/"
+    segments = [segment for segment in raw_path.split("/") if segment]
+    if len(segments) > MAX_DEPTH + 1:
+        return "depth"
+    for segment in segments:
+        if len(segment) > MAX_SEGMENT_LENGTH and segment.isalnum():
+            return "segment"
+    if domain.endswith(VALID_DOMAINS):
+        return "extension" if _has_extension(path) else None
+    if domain == TODAY_UCI_HOST and path.startswith(TODAY_UCI_PATH):
+        return None
+    return "domain"
+
+
+def is_valid(url):
+    return rejection(url) is None
+
+
+# the crawlable urls of a batch, each once, in the order they first appear
+def filter_urls(urls):
+    seen = set()
+    valid = list()
+    for url in urls:
+        if url and url not in seen:
+            seen.add(url)
+            if rejection(url) is None:
+                valid.append(url)
+    return valid
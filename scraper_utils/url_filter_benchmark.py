@@ -0,0 +1,142 @@
+import re
+import time
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+from scraper_utils import url_filter
+from scraper_utils.links import iter_links
+
+'''
+checks scraper_utils/url_filter.py against the is_valid chain it replaced and
+times both on the same stream of links:
+    python3 -m scraper_utils.url_filter_benchmark --archive <ARCHIVE>
+    python3 -m scraper_utils.url_filter_benchmark --synthetic 500
+the links are every link of every page, in crawl order and with their repeats,
+so the memo sees what it sees in a crawl. "cold" runs the compiled rules
+without the memo, "memo" with it and "batch" is filter_urls on all of them
+'''
+
+# the edge cases of the old rules, always checked
+EDGE_CASES = [
+    None, "", "mailto:someone@ics.uci.edu", "ftp://ics.uci.edu/a",
+    "https://physics.uci.edu/a", "https://www.ics.uci.edu:443/a", "HTTPS://WWW.ICS.UCI.EDU/A.PDF",
+    "https://www.ics.uci.edu/a.tar.gz", "https://www.ics.uci.edu/a.pdf/b", "https://www.ics.uci.edu/.z",
+    "https://www.ics.uci.edu/a.", "https://www.ics.uci.edu/events_calendar/x", "https://www.ics.uci.edu/a?Month=3",
+    "https://www.ics.uci.edu/~eppestein/pix/a", "https://gitlab.ics.uci.edu/a", "https://www.ics.uci.edu/github.com",
+    "https://www.ics.uci.edu/1/2/3/4/5/6/7/8/9", "https://www.ics.uci.edu/1/2/3/4/5/6/7/8/9/10",
+    "https://www.ics.uci.edu/" + "a" * 21, "https://www.ics.uci.edu/" + "a-" * 11,
+    "https://today.uci.edu/department/information_computer_sciences/x", "https://today.uci.edu/other",
+    "https://www.stat.uci.edu/a.PY",
+]
+
+
+# the is_valid of scraper.py before the rules were compiled, without its logging
+def reference_is_valid(url):
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    domain = parsed.netloc.lower()
+    path = parsed.path.lower()
+    query = parsed.query.lower()
+    if "gitlab.ics.uci.edu" in domain or "github.com" in domain:
+        return False
+    if "/events_calendar" in path or "/calendar" in path or "/events" in path or "date=" in query or "year=" in query or "month=" in query:
+        return False
+    if "~eppestein" in domain and "/pix/" in path:
+        return False
+    MAX_DEPTH = 8
+    MAX_SEGMENT_LENGTH = 20
+    path_segments = [segment for segment in parsed.path.split('/') if segment]
+    for i, segment in enumerate(path_segments):
+        if i > MAX_DEPTH:
+            return False
+        if segment.isalnum() and len(segment) > MAX_SEGMENT_LENGTH:
+            return False
+    valid_domains = [
+        "ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"
+    ]
+    today_uci_path = "/department/information_computer_sciences/"
+    if any(domain.endswith(d) for d in valid_domains):
+        return not re.match(
+            r".*\.(css|js|bmp|gif|jpe?g|ico"
+            + r"|png|tiff?|mid|mp2|mp3|mp4"
+            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+            + r"|epub|dll|cnf|tgz|sha1"
+            + r"|thmx|mso|arff|rtf|jar|csv"
+            + r"|rm|smil|wmv|swf|wma|zip|rar|gz"
+            + r"|img|java|war|sql|mpg|ff|sh|ppsx|py|apk|svg|conf|cpp|fig|cls|ipynb|bam|odp|odc|tsv|nb|bib|z|rpm|ma)$",
+            parsed.path.lower())
+    if domain == "today.uci.edu" and path.startswith(today_uci_path):
+        return True
+    return False
+
+
+def archive_links(directory, limit):
+    from crawler.archive import ArchiveReader
+    links = list()
+    for url, resp in ArchiveReader(directory):
+        links.append(url)
+        if resp.status == 200 and resp.content:
+            links.extend(iter_links(url, resp.content))
+            if len(links) >= limit:
+                break
+    return links[:limit]
+
+
+def synthetic_links(pages):
+    from utils.local_cache import SyntheticSource
+    seeds = ["https://www.ics.uci.edu", "https://www.stat.uci.edu"]
+    source = SyntheticSource(seeds, hosts=2, pages=pages)
+    links = list()
+    for seed in seeds:
+        for i in range(pages):
+            url = f"{seed}/page/{i}"
+            page = source.page(url)
+            if page is not None:
+                links.append(url)
+                links.extend(iter_links(url, page[2]))
+    return links
+
+
+def timed(function, links, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for link in links:
+            function(link)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(links, repeat):
+    differ = [
+        link for link in EDGE_CASES + links
+        if url_filter.is_valid(link) != reference_is_valid(link)]
+    print(f"{len(links)} links, {len(set(links))} distinct, {len(differ)} decisions differ")
+    for link in differ[:10]:
+        print(f"    {link}")
+    reference = timed(reference_is_valid, links, repeat)
+    cold = timed(url_filter.rejection.__wrapped__, links, repeat)
+    url_filter.rejection.cache_clear()
+    memo = timed(url_filter.rejection, links, repeat)
+    batch = timed(url_filter.filter_urls, [links], repeat)
+    for name, elapsed in (("reference", reference), ("cold", cold), ("memo", memo)):
+        print(f"{name:>10}: {elapsed / len(links) * 1e6:6.2f} us/link  {reference / elapsed:5.1f}x")
+    print(f"{'batch':>10}: {batch / len(links) * 1e6:6.2f} us/link  {reference / batch:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--archive", type=str, default=None)
+    parser.add_argument("--synthetic", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if args.archive:
+        links = archive_links(args.archive, args.limit)
+    else:
+        links = synthetic_links(args.synthetic)
+    run(links, args.repeat)
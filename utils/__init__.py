@@ -3,6 +3,8 @@ import logging
 from hashlib import sha256
 from urllib.parse import urlparse
 
+from utils.canonical import canonicalize
+
 def get_logger(name, filename=None):
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
@@ -22,8 +24,9 @@ def get_logger(name, filename=None):
     return logger
 
 
+# equivalent urls hash the same, see utils/canonical.py
 def get_urlhash(url):
-    parsed = urlparse(url)
+    parsed = urlparse(canonicalize(url))
     # everything other than scheme.
     return sha256(
         f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
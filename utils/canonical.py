@@ -0,0 +1,134 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, quote
+
+'''
+the one way a url is written before it is hashed, queued, fetched or counted,
+so equivalent urls are the same entry (python3 launch.py reads the options of
+[CRAWLER] in config.ini):
+    scheme and host    -> lowercased, the host without a trailing dot
+    port               -> dropped when it is the default one of the scheme
+    path               -> ./ and ../ resolved, no trailing slash, and an
+                          INDEXFILES last segment folded into its directory
+    percent-encoding   -> escapes of unreserved characters decoded, the other
+                          escapes in uppercase, spaces and non ascii escaped
+    query              -> QUERY drop: removed, which is what the scraper always
+                          did with links. sort: parameters sorted and the
+                          STRIPPARAMS ones removed. keep: as written
+    fragment           -> removed
+so HTTP://WWW.ics.uci.edu:80/a/./b/, http://www.ics.uci.edu/a/b and
+http://www.ics.uci.edu/a/b/index.html are all http://www.ics.uci.edu/a/b.
+a url that already looks canonical skips the parsing (_CANONICAL)
+'''
+
+DROP, SORT, KEEP = "drop", "sort", "keep"
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+_query = DROP
+_strip_params = frozenset()
+_index_files = frozenset(("index.html", "index.htm", "index.php"))
+
+# http(s), a lowercase host without port, a path of plain characters, no query
+# and no fragment. the path still needs the dot segment, trailing slash and
+# index file checks of _is_canonical
+_CANONICAL = re.compile(r"https?://[a-z0-9-]+(?:\.[a-z0-9-]+)*(?:/[A-Za-z0-9._~!$&'()*+,;=:@/-]*)?")
+_DOT_SEGMENT = re.compile(r"/\.\.?(?:/|$)")
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_UNRESERVED = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+# what quote leaves alone in a path or query: the reserved characters and the
+# escapes already there
+_SAFE = "/%:@!$&'()*+,;=?"
+
+
+# picks the QUERY mode, the STRIPPARAMS and the INDEXFILES. parser processes
+# (--engine pipeline) call it too, since they do not share the module globals
+def configure(query=DROP, strip_params=(), index_files=_index_files):
+    global _query, _strip_params, _index_files
+    assert query in (DROP, SORT, KEEP), "QUERY should be drop, sort or keep"
+    _query = query
+    _strip_params = frozenset(name.lower() for name in strip_params)
+    _index_files = frozenset(name.lower() for name in index_files)
+
+
+# the arguments of configure as they are now, to pass to another process
+def settings():
+    return {"query": _query, "strip_params": tuple(_strip_params), "index_files": tuple(_index_files)}
+
+
+def _unescape_unreserved(match):
+    byte = int(match.group(1), 16)
+    if byte in _UNRESERVED:
+        return chr(byte)
+    return "%" + match.group(1).upper()
+
+
+def _escape(part):
+    if "%" in part:
+        part = _ESCAPE.sub(_unescape_unreserved, part)
+    return quote(part, safe=_SAFE)
+
+
+def _remove_dot_segments(path):
+    segments = list()
+    for segment in path.split("/")[1:]:
+        if segment == "..":
+            if segments:
+                segments.pop()
+        elif segment != ".":
+            segments.append(segment)
+    return "/" + "/".join(segments)
+
+
+def _host(scheme, netloc):
+    userinfo, at, hostport = netloc.rpartition("@")
+    host, port = hostport, ""
+    if not hostport.endswith("]"):
+        # not a bare [ipv6] address
+        head, colon, tail = hostport.rpartition(":")
+        if colon and (tail.isdigit() or not tail):
+            host, port = head, tail
+    host = host.lower().rstrip(".")
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    return userinfo + at + host
+
+
+def _sorted_query(query):
+    params = [
+        param for param in query.split("&")
+        if param and param.partition("=")[0].lower() not in _strip_params]
+    return "&".join(sorted(params))
+
+
+def _fold_path(path):
+    if "/." in path and _DOT_SEGMENT.search(path):
+        path = _remove_dot_segments(path)
+    # the slash goes before the index check too, so /a/index.html/ folds like
+    # /a/index.html and a canonical url stays the same when canonicalized again
+    head, _, last = path.rstrip("/").rpartition("/")
+    if last.lower() in _index_files:
+        path = head
+    return path.rstrip("/")
+
+
+def _is_canonical(url):
+    if _CANONICAL.fullmatch(url) is None or url.endswith("/"):
+        return False
+    if "/." in url and _DOT_SEGMENT.search(url):
+        return False
+    return url.rpartition("/")[2].lower() not in _index_files
+
+
+def canonicalize(url):
+    if _is_canonical(url):
+        return url
+    scheme, netloc, path, query, _ = urlsplit(url.strip())
+    scheme = scheme.lower()
+    netloc = _host(scheme, netloc)
+    path = _fold_path(_escape(path))
+    if _query == DROP:
+        query = ""
+    elif query:
+        query = _escape(query)
+        if _query == SORT:
+            query = _sorted_query(query)
+    return urlunsplit((scheme, netloc, path, query, ""))
@@ -8,12 +8,91 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        # --engine pipeline: parser processes (0 means one per core) and how many
+        # downloaded pages may wait for them
+        self.parsers = int(config["LOCAL PROPERTIES"].get("PARSERS", "0"))
+        self.pipeline_queue = int(config["LOCAL PROPERTIES"].get("PIPELINEQUEUE", "64"))
+        # html parser backend of the scraper, see scraper_utils/parsers.py
+        self.parser = config["LOCAL PROPERTIES"].get("PARSER", "bs4").strip().lower()
+        assert self.parser in {"bs4", "lxml", "streaming"}, "PARSER should be bs4, lxml or streaming"
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        # backend of the save file, one of crawler.storage.STORES
+        self.store = config["LOCAL PROPERTIES"].get("STORE", "shelve").strip().lower()
+        # in-memory seen url index: hashset, bloom or none, see crawler/seen.py
+        self.seen_index = config["LOCAL PROPERTIES"].get("SEENINDEX", "hashset").strip().lower()
+        assert self.seen_index in {"hashset", "bloom", "none"}, "SEENINDEX should be hashset, bloom or none"
+        self.seen_memory = int(float(config["LOCAL PROPERTIES"].get("SEENMEMORY", "32")) * 1024 * 1024)
+        self.seen_capacity = int(config["LOCAL PROPERTIES"].get("SEENCAPACITY", "1000000"))
+        # pending urls kept in memory, lower priority ones past this spill to disk
+        self.max_queued = int(config["LOCAL PROPERTIES"].get("MAXQUEUED", "100000"))
+        self.spill_segment = int(config["LOCAL PROPERTIES"].get("SPILLSEGMENT", "10000"))
+        # "sync" flushes the save file on every change, "batch" buffers changes
+        # and flushes every FLUSHEVERY changes or every FLUSHINTERVAL ms
+        self.durability = config["LOCAL PROPERTIES"].get("DURABILITY", "sync").strip().lower()
+        assert self.durability in {"sync", "batch"}, "DURABILITY should be either sync or batch"
+        self.flush_every = int(config["LOCAL PROPERTIES"].get("FLUSHEVERY", "500"))
+        self.flush_interval = int(config["LOCAL PROPERTIES"].get("FLUSHINTERVAL", "1000")) / 1000
+        # what each page looked like when last fetched, empty turns it off (see crawler/recrawl.py)
+        self.meta_file = config["LOCAL PROPERTIES"].get("METAFILE", "").strip()
+        # --recrawl: pages fetched less than this many hours ago are not downloaded again
+        self.recrawl_after = float(config["LOCAL PROPERTIES"].get("RECRAWLAFTER", "0")) * 3600
+        # set by launch.py --recrawl
+        self.recrawl = False
+        # counts and decisions of the trap detection, empty turns it off (see crawler/traps.py)
+        self.trap_file = config["LOCAL PROPERTIES"].get("TRAPFILE", "").strip()
+        # directory archiving every fetched response for replay.py, empty turns it off
+        self.archive = config["LOCAL PROPERTIES"].get("ARCHIVE", "").strip()
+        self.archive_segment = int(float(config["LOCAL PROPERTIES"].get("ARCHIVESEGMENT", "64")) * 1024 * 1024)
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        # keep-alive connections to the cache server, defaults to one per worker
+        self.pool_size = int(config["CONNECTION"].get("POOLSIZE", "0")) or self.threads_count
+        # downloads in flight at once with --engine asyncio
+        self.max_in_flight = int(config["CONNECTION"].get("MAXINFLIGHT", "200"))
+        # seconds to connect to and to hear from the cache server, and for a whole download
+        self.connect_timeout = float(config["CONNECTION"].get("CONNECTTIMEOUT", "5"))
+        self.read_timeout = float(config["CONNECTION"].get("READTIMEOUT", "30"))
+        self.fetch_deadline = float(config["CONNECTION"].get("DEADLINE", "60"))
+        # percentile of the fetch latency after which a second request is sent, 0 is off
+        self.hedge = float(config["CONNECTION"].get("HEDGE", "0"))
+        assert 0 <= self.hedge < 100, "HEDGE should be a percentile below 100, or 0"
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        # names from crawler.scoring.SCORERS, the first one decides and the rest break ties
+        self.scorers = [
+            name.strip().lower()
+            for name in config["CRAWLER"].get("SCORERS", "depth,fairness,inlinks").split(",")]
+        # failing hosts (5xx, timeouts) back off, see utils/host_health.py
+        self.max_retries = int(config["CRAWLER"].get("RETRIES", "3"))
+        self.backoff = float(config["CRAWLER"].get("BACKOFF", "1"))
+        self.max_backoff = float(config["CRAWLER"].get("MAXBACKOFF", "60"))
+        self.circuit_failures = int(config["CRAWLER"].get("CIRCUITFAILURES", "5"))
+        self.circuit_cooldown = float(config["CRAWLER"].get("CIRCUITCOOLDOWN", "300"))
+        # url templates are judged after TRAPFETCHES fetches, see crawler/traps.py
+        self.trap_fetches = int(config["CRAWLER"].get("TRAPFETCHES", "30"))
+        self.trap_empty = float(config["CRAWLER"].get("TRAPEMPTY", "0.8"))
+        self.trap_fresh = float(config["CRAWLER"].get("TRAPFRESH", "0.05"))
+        self.trap_expire = float(config["CRAWLER"].get("TRAPEXPIRE", "24")) * 3600
+        # the counts fade so they reflect about the last TRAPWINDOW fetches
+        self.trap_window = int(config["CRAWLER"].get("TRAPWINDOW", "100"))
+        assert self.trap_window > self.trap_fetches, "TRAPWINDOW should be more than TRAPFETCHES"
+        # how urls are canonicalized, see utils/canonical.py
+        self.query = config["CRAWLER"].get("QUERY", "drop").strip().lower()
+        assert self.query in ("drop", "sort", "keep"), "QUERY should be drop, sort or keep"
+        self.strip_params = [
+            name.strip() for name in config["CRAWLER"].get("STRIPPARAMS", "").split(",") if name.strip()]
+        self.index_files = [
+            name.strip() for name in config["CRAWLER"].get("INDEXFILES", "index.html,index.htm,index.php").split(",")
+            if name.strip()]
+
+        # python3 launch.py --local-cache: pages from a recorded corpus directory,
+        # or a synthetic site graph when CORPUS is empty (see utils/local_cache.py)
+        self.local_corpus = config.get("LOCAL CACHE", "CORPUS", fallback="").strip()
+        self.synthetic_hosts = config.getint("LOCAL CACHE", "SYNTHETICHOSTS", fallback=5)
+        self.synthetic_pages = config.getint("LOCAL CACHE", "SYNTHETICPAGES", fallback=200)
+        self.synthetic_links = config.getint("LOCAL CACHE", "SYNTHETICLINKS", fallback=20)
+        self.local_latency = config.getfloat("LOCAL CACHE", "LATENCY", fallback=0) / 1000
 
         self.cache_server = None
\ No newline at end of file
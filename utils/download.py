@@ -1,19 +1,189 @@
 import requests
 import cbor
 import time
-import pickle
+import asyncio
+
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
 
 from utils.response import Response
+from utils.host_health import HostHealth, get_host
+from utils.fetch_stats import FetchStats
+
+# one keep-alive session shared by every worker, so a download reuses an open
+# connection to the cache server instead of doing a new handshake each time
+_session = None
+_session_lock = Lock()
+_host_health = None
+# threads the requests run on, so a download can stop waiting at its DEADLINE
+# or send a hedged request while the first one is still going
+_fetch_pool = None
+_fetch_stats = FetchStats()
+
+# room for a hedged request per worker, plus requests left behind at the deadline
+def _fetch_workers(config):
+    return 3 * config.threads_count + 2
+
+def get_session(config):
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            # every request goes to the same cache server, so one pool is enough,
+            # sized so each worker thread can hold a connection. with HEDGE on
+            # every thread of the fetch pool can have a request going
+            pool_size = config.pool_size
+            if config.hedge:
+                pool_size = max(pool_size, _fetch_workers(config))
+            _session.mount("http://", HTTPAdapter(
+                pool_connections=1, pool_maxsize=pool_size))
+        return _session
+
+def get_fetch_pool(config):
+    global _fetch_pool
+    with _session_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=_fetch_workers(config))
+        return _fetch_pool
+
+def get_host_health(config):
+    global _host_health
+    with _session_lock:
+        if _host_health is None:
+            _host_health = HostHealth(
+                config.backoff, config.max_backoff,
+                config.circuit_failures, config.circuit_cooldown, config.max_retries)
+        return _host_health
+
+# a 5xx or a timeout counts against the host. resp.retry_after is then the
+# number of seconds after which the url should be downloaded again, it stays
+# None and resp.host_dead is set when the host is dead
+def _check_health(url, config, resp):
+    health = get_host_health(config)
+    if resp.status is None or 500 <= resp.status < 600:
+        resp.retry_after = health.failure(get_host(url))
+        resp.host_dead = resp.retry_after is None
+    else:
+        health.success(get_host(url))
+    return resp
 
-def download(url, config, logger=None):
+# how many requests went to the cache server and how many connections they needed
+def transport_stats():
+    requests_count, connections = 0, 0
+    if _session is not None:
+        pools = _session.get_adapter("http://").poolmanager.pools
+        for key in pools.keys():
+            requests_count += pools[key].num_requests
+            connections += pools[key].num_connections
+    return {
+        "requests": requests_count,
+        "connections": connections,
+        "reused": requests_count - connections}
+
+# fetch latency percentiles, stalls and hedged requests, see utils/fetch_stats.py
+def fetch_stats():
+    return _fetch_stats.summary()
+
+# end of crawl report of both, for the crawl engines
+def log_transport_stats(logger):
+    stats = transport_stats()
+    if stats["requests"]:
+        logger.info(
+            f"Made {stats['requests']} requests to the cache server over "
+            f"{stats['connections']} connections ({stats['reused']} reused).")
+    stats = fetch_stats()
+    if stats["fetches"]:
+        logger.info(
+            f"Fetch latency p50 {stats['p50'] or 0:.3f}s, p95 {stats['p95'] or 0:.3f}s, "
+            f"p99 {stats['p99'] or 0:.3f}s over {stats['fetches']} fetches, "
+            f"{stats['stalls']} stalled, {stats['hedged']} hedged "
+            f"({stats['hedge_wins']} won by the hedge).")
+
+# seconds after which a second request is sent for the same url, None when
+# HEDGE is off or there are not enough fetches yet to know the percentile
+def _hedge_after(config):
+    if not config.hedge:
+        return None
+    return _fetch_stats.percentile(config.hedge)
+
+# dead hosts (see utils/host_health.py) are not asked for at all
+def _dead_host(url, config):
+    if get_host_health(config).is_dead(get_host(url)):
+        resp = Response({
+            "error": f"Host of {url} stopped responding.", "status": None, "url": url})
+        resp.host_dead = True
+        return resp
+    return None
+
+# cache server query for a url. validators is the (etag, last modified) of the
+# copy we already have, sent as inm / ims so the server can answer 304
+def _query(url, config, validators=None):
+    params = [("q", f"{url}"), ("u", f"{config.user_agent}")]
+    if validators is not None:
+        etag, last_modified = validators
+        if etag:
+            params.append(("inm", etag))
+        if last_modified:
+            params.append(("ims", last_modified))
+    return params
+
+def _fetch(url, config, validators=None):
     host, port = config.cache_server
-    resp = requests.get(
+    started = time.monotonic()
+    resp = get_session(config).get(
         f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+        params=_query(url, config, validators),
+        timeout=(config.connect_timeout, config.read_timeout))
+    _fetch_stats.record(time.monotonic() - started)
+    return resp
+
+# runs _fetch on the fetch pool, hedged once it takes longer than the HEDGE
+# percentile. the first request to answer wins, the other one is left to finish
+# on its own. raises Timeout when nothing answered within DEADLINE seconds
+def _fetch_with_deadline(url, config, validators=None):
+    pool = get_fetch_pool(config)
+    deadline = time.monotonic() + config.fetch_deadline
+    futures = [pool.submit(_fetch, url, config, validators)]
+    hedge_after = _hedge_after(config)
+    if hedge_after is not None and not wait(futures, timeout=hedge_after).done:
+        _fetch_stats.hedge()
+        futures.append(pool.submit(_fetch, url, config, validators))
+    pending, error = set(futures), None
+    while pending:
+        done, pending = wait(
+            pending, timeout=max(0, deadline - time.monotonic()),
+            return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            try:
+                resp = future.result()
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+            if future is not futures[0]:
+                _fetch_stats.hedge_won()
+            return resp
+    if pending or error is None:
+        raise requests.exceptions.Timeout(f"No response within {config.fetch_deadline}s")
+    raise error
+
+def download(url, config, logger=None, validators=None):
+    dead = _dead_host(url, config)
+    if dead:
+        return dead
+    try:
+        resp = _fetch_with_deadline(url, config, validators)
+    except requests.exceptions.Timeout as e:
+        _fetch_stats.stall()
+        logger.error(f"Timed out downloading {url}: {e}")
+        return _check_health(url, config, Response({
+            "error": f"Timed out downloading {url}.", "status": None, "url": url}))
     try:
         if resp and resp.content:
-            return Response(cbor.loads(resp.content))
-    except (EOFError, ValueError) as e:
+            return _check_health(url, config, Response(cbor.loads(resp.content)))
+    except (EOFError, ValueError):
         pass
     logger.error(f"Spacetime Response error {resp} with url {url}.")
     return Response({
@@ -22,6 +192,76 @@ def download(url, config, logger=None):
         "url": url})
 
 
+# the connect and read timeouts come from the aiohttp session, see crawler/async_engine.py
+async def _fetch_async(url, config, session, validators=None):
+    host, port = config.cache_server
+    started = time.monotonic()
+    async with session.get(
+            f"http://{host}:{port}/",
+            params=_query(url, config, validators)) as resp:
+        content = await resp.read()
+    _fetch_stats.record(time.monotonic() - started)
+    return resp, content
+
+# same as _fetch_with_deadline, with tasks instead of threads. the losing
+# request is cancelled
+async def _fetch_with_deadline_async(url, config, session, validators=None):
+    deadline = time.monotonic() + config.fetch_deadline
+    tasks = [asyncio.ensure_future(_fetch_async(url, config, session, validators))]
+    hedge_after = _hedge_after(config)
+    if hedge_after is not None:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            _fetch_stats.hedge()
+            tasks.append(asyncio.ensure_future(_fetch_async(url, config, session, validators)))
+    pending, error = set(tasks), None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0, deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                try:
+                    result = task.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if task is not tasks[0]:
+                    _fetch_stats.hedge_won()
+                return result
+    finally:
+        for task in pending:
+            task.cancel()
+    if pending or error is None or isinstance(error, asyncio.TimeoutError):
+        raise asyncio.TimeoutError(f"No response within {config.fetch_deadline}s")
+    raise error
+
+# same as download, but through an aiohttp session for the asyncio engine
+async def download_async(url, config, session, logger=None, validators=None):
+    dead = _dead_host(url, config)
+    if dead:
+        return dead
+    try:
+        resp, content = await _fetch_with_deadline_async(url, config, session, validators)
+    except asyncio.TimeoutError:
+        _fetch_stats.stall()
+        logger.error(f"Timed out downloading {url}.")
+        return _check_health(url, config, Response({
+            "error": f"Timed out downloading {url}.", "status": None, "url": url}))
+    try:
+        if resp.ok and content:
+            return _check_health(url, config, Response(cbor.loads(content)))
+    except (EOFError, ValueError):
+        pass
+    logger.error(f"Spacetime Response error {resp.status} with url {url}.")
+    return Response({
+        "error": f"Spacetime Response error {resp.status} with url {url}.",
+        "status": resp.status,
+        "url": url})
+
+
 # def download(url, config, logger=None):
 #     try:
 #         resp = requests.get(url)
@@ -0,0 +1,72 @@
+from threading import Lock
+from collections import deque
+
+'''
+latency of the requests to the cache server. the last WINDOW fetch times are
+kept to answer percentiles (the hedging threshold, the end of crawl report),
+next to running counts of
+    stalls -> downloads that timed out or ran past the DEADLINE
+    hedged -> downloads that sent a second request, and how many of those the
+              second request won
+'''
+
+
+class FetchStats(object):
+    WINDOW = 2000
+    # percentiles are not trusted below this many samples
+    MIN_SAMPLES = 20
+    # sorted window is rebuilt after this many new samples
+    RESORT_EVERY = 50
+
+    def __init__(self):
+        self.lock = Lock()
+        self.samples = deque(maxlen=self.WINDOW)
+        self.sorted = list()
+        self.unsorted = 0
+        self.fetches = 0
+        self.stalls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.fetches += 1
+            self.unsorted += 1
+
+    def stall(self):
+        with self.lock:
+            self.stalls += 1
+
+    def hedge(self):
+        with self.lock:
+            self.hedged += 1
+
+    def hedge_won(self):
+        with self.lock:
+            self.hedge_wins += 1
+
+    # seconds under which p percent of the recent fetches finished, None
+    # while there are too few of them
+    def percentile(self, p):
+        with self.lock:
+            if len(self.samples) < self.MIN_SAMPLES:
+                return None
+            if self.unsorted >= self.RESORT_EVERY or len(self.sorted) < self.MIN_SAMPLES:
+                self.sorted = sorted(self.samples)
+                self.unsorted = 0
+            index = min(len(self.sorted) - 1, int(len(self.sorted) * p / 100))
+            return self.sorted[index]
+
+    def summary(self):
+        with self.lock:
+            # the report always uses the current window
+            self.unsorted = self.RESORT_EVERY
+        return {
+            "fetches": self.fetches,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "stalls": self.stalls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins}
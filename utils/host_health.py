@@ -0,0 +1,72 @@
+from threading import Lock
+from urllib.parse import urlparse
+
+from utils import get_logger
+
+'''
+health of every host we download from, so a dead or overloaded subdomain stops
+taking fetch slots from the ones that respond. a download that fails (5xx from
+the host, or the request timing out) is put back in the frontier and its host
+is kept away for a while:
+    backoff -> BACKOFF seconds after the first failure, doubling with every
+               consecutive one up to MAXBACKOFF
+    circuit -> after CIRCUITFAILURES consecutive failures the circuit opens and
+               the host gets no downloads for CIRCUITCOOLDOWN seconds. then one
+               url goes through: a success closes the circuit, another failure
+               opens it again for twice as long
+    dead    -> once that probe failed RETRIES times the host is given up on
+               for the rest of the run. its urls stay pending in the save
+               file, the next run tries them again (Frontier.park_url)
+a successful download resets the host
+'''
+
+
+def get_host(url):
+    return urlparse(url).netloc.lower()
+
+
+class HostHealth(object):
+    def __init__(self, backoff, max_backoff, circuit_failures, circuit_cooldown, probes):
+        self.logger = get_logger("HEALTH")
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.circuit_failures = circuit_failures
+        self.circuit_cooldown = circuit_cooldown
+        self.probes = probes
+        self.lock = Lock()
+        # host -> consecutive failed downloads
+        self.failures = dict()
+
+    # a download from the host worked, closes its circuit if it was open
+    def success(self, host):
+        with self.lock:
+            failures = self.failures.pop(host, 0)
+        if failures >= self.circuit_failures:
+            self.logger.info(f"Circuit closed for {host}, it is responding again.")
+
+    # a download from the host failed, returns the seconds to keep it away,
+    # or None when the host is dead
+    def failure(self, host):
+        with self.lock:
+            failures = self.failures[host] = self.failures.get(host, 0) + 1
+        if failures < self.circuit_failures:
+            return min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+        if failures >= self.circuit_failures + self.probes:
+            if failures == self.circuit_failures + self.probes:
+                self.logger.warning(f"Giving up on {host} after {failures} failures in a row.")
+            return None
+        cooldown = self.circuit_cooldown * 2 ** (failures - self.circuit_failures)
+        self.logger.warning(
+            f"Circuit open for {host} after {failures} failures in a row, "
+            f"retrying it in {cooldown:.0f}s.")
+        return cooldown
+
+    def is_dead(self, host):
+        with self.lock:
+            return self.failures.get(host, 0) >= self.circuit_failures + self.probes
+
+    def open_circuits(self):
+        with self.lock:
+            return sorted(
+                host for host, failures in self.failures.items()
+                if failures >= self.circuit_failures)
@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import pickle
+import random
+import hashlib
+from email.utils import parsedate_to_datetime
+from threading import Thread, Lock
+from argparse import ArgumentParser
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cbor
+import requests
+
+'''
+local stand-in for the spacetime cache server, so full crawls can run offline
+(python3 launch.py --local-cache). it speaks the same protocol as the real one:
+    GET /?q=<url>&u=<useragent>  ->  cbor encoded Response dict
+                                     {"url", "status", "response": pickled requests.Response}
+pages come from one of three sources
+    ArchiveSource   -> the ARCHIVE directory of an earlier crawl (crawler/archive.py),
+                       every url answered with its latest archived response
+    CorpusSource    -> pages recorded on disk, a directory with an index.jsonl of
+                       {"url", "status", "headers", "body"} lines, "body" being a
+                       file name relative to the directory
+    SyntheticSource -> a generated, deterministic site graph over the seed domains
+conditional queries (inm=<etag>, ims=<last modified>, see crawler/recrawl.py)
+get a 304 when the page still matches
+'''
+
+
+def make_response(url, status, headers, body):
+    ''' Builds the same pickled requests.Response the real cache server sends. '''
+    raw = requests.models.Response()
+    raw.url = url
+    raw.status_code = status
+    raw.headers = requests.structures.CaseInsensitiveDict(headers)
+    raw._content = body
+    raw.encoding = "utf-8"
+    return {"url": url, "status": status, "response": pickle.dumps(raw)}
+
+
+def not_found(url):
+    return make_response(url, 404, {}, b"")
+
+
+def _not_modified(headers, etag, modified_since):
+    if etag and headers.get("ETag") == etag:
+        return True
+    if modified_since and headers.get("Last-Modified"):
+        try:
+            return (parsedate_to_datetime(headers["Last-Modified"])
+                    <= parsedate_to_datetime(modified_since))
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class Source(object):
+    ''' A source maps a url to (status, headers, body) in page(), None when
+    it has no such page. get() turns that into a cache server response. '''
+
+    def page(self, url):
+        raise NotImplementedError
+
+    def get(self, url, etag=None, modified_since=None):
+        page = self.page(url)
+        if page is None:
+            return not_found(url)
+        status, headers, body = page
+        headers = requests.structures.CaseInsensitiveDict(headers)
+        if status == 200 and _not_modified(headers, etag, modified_since):
+            return make_response(url, 304, headers, b"")
+        return make_response(url, status, headers, body)
+
+
+class CorpusSource(Source):
+    def __init__(self, directory):
+        self.directory = directory
+        self.pages = dict()
+        with open(os.path.join(directory, "index.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    page = json.loads(line)
+                    self.pages[page["url"]] = page
+
+    def page(self, url):
+        page = self.pages.get(url) or self.pages.get(url.rstrip("/"))
+        if page is None:
+            return None
+        with open(os.path.join(self.directory, page["body"]), "rb") as f:
+            body = f.read()
+        return page["status"], page.get("headers", {}), body
+
+
+class ArchiveSource(Source):
+    def __init__(self, directory):
+        from crawler.archive import ArchiveReader
+        self.reader = ArchiveReader(directory)
+        # the reader loads its index on the first get, once for every handler thread
+        self.lock = Lock()
+
+    def page(self, url):
+        with self.lock:
+            resp = self.reader.get(url) or self.reader.get(url.rstrip("/"))
+        if resp is None or resp.status is None:
+            # not fetched, or the download failed without an answer
+            return None
+        return resp.status, resp.headers, resp.content or b""
+
+
+class SyntheticSource(Source):
+    ''' Every seed domain gets `hosts` subdomains with `pages` pages each. Page
+    content and links are derived from a hash of the url, so every run (and
+    every crawler asking for the same url) sees exactly the same site. '''
+
+    WORDS = (
+        "research student faculty computer science informatics statistics data "
+        "learning software systems graduate undergraduate course seminar lab "
+        "network security vision language theory algorithm database project "
+        "award paper conference professor department university campus").split()
+
+    def __init__(self, seed_urls, hosts=5, pages=200, links=20):
+        domains = [urlparse(url).netloc.lower() for url in seed_urls]
+        self.hosts = list(domains)
+        for domain in domains:
+            base = domain[4:] if domain.startswith("www.") else domain
+            self.hosts += [f"site{i}.{base}" for i in range(hosts)]
+        self.pages = pages
+        self.links = links
+
+    def _random(self, url):
+        return random.Random(int(hashlib.sha256(url.encode("utf-8")).hexdigest()[:16], 16))
+
+    def page(self, url):
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        path = parsed.path.strip("/")
+        if host not in self.hosts:
+            return None
+        if path and not (path.startswith("page/") and path[5:].isdigit()
+                         and int(path[5:]) < self.pages):
+            return None
+        rng = self._random(url)
+        hrefs = list()
+        for _ in range(self.links):
+            # mostly links within the same host, some to the other hosts
+            target = host if rng.random() < 0.8 else rng.choice(self.hosts)
+            hrefs.append(f"{parsed.scheme}://{target}/page/{rng.randrange(self.pages)}")
+        paragraphs = "".join(
+            "<p>" + " ".join(rng.choice(self.WORDS) for _ in range(rng.randint(20, 120))) + "</p>"
+            for _ in range(rng.randint(1, 6)))
+        anchors = "".join(f'<a href="{href}">link</a> ' for href in hrefs)
+        body = (
+            f"<html><head><title>{url}</title></head>"
+            f"<body>{paragraphs}{anchors}</body></html>").encode("utf-8")
+        headers = {
+            "Content-Type": "text/html; charset=utf-8",
+            "ETag": '"' + hashlib.sha1(body).hexdigest() + '"'}
+        return 200, headers, body
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # the crawler hung up on a request it gave up on (deadline, hedged fetch)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class LocalCacheServer(object):
+    def __init__(self, source, host="127.0.0.1", port=0, latency=0):
+        self.source = source
+        # seconds added to every response, to mimic a remote cache server
+        self.latency = latency
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive, like the real server. headers and body are separate
+            # writes, without TCP_NODELAY the body waits for the delayed ACK
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                url = query.get("q", [""])[0]
+                if server.latency:
+                    time.sleep(server.latency)
+                body = cbor.dumps(server.source.get(
+                    url, query.get("inm", [None])[0], query.get("ims", [None])[0]))
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = _Server((host, port), Handler)
+
+    @property
+    def address(self):
+        return self.httpd.server_address[:2]
+
+    def start(self):
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self.address
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+# picks the source from the [LOCAL CACHE] options of the config
+def make_source(config):
+    if config.local_corpus:
+        if os.path.exists(os.path.join(config.local_corpus, "index.tsv")):
+            return ArchiveSource(config.local_corpus)
+        return CorpusSource(config.local_corpus)
+    return SyntheticSource(
+        config.seed_urls, config.synthetic_hosts,
+        config.synthetic_pages, config.synthetic_links)
+
+
+def start_local_cache(config):
+    server = LocalCacheServer(make_source(config), latency=config.local_latency)
+    return server.start()
+
+
+if __name__ == "__main__":
+    # standalone server, e.g. to point several crawlers at the same site
+    from configparser import ConfigParser
+    from utils.config import Config
+    parser = ArgumentParser()
+    parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    cparser = ConfigParser()
+    cparser.read(args.config_file)
+    config = Config(cparser)
+    server = LocalCacheServer(
+        make_source(config), host="0.0.0.0", port=args.port, latency=config.local_latency)
+    print(f"Local cache server on port {args.port}")
+    server.httpd.serve_forever()
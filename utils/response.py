@@ -1,14 +1,59 @@
 import pickle
 
+from requests.structures import CaseInsensitiveDict
+
+'''
+the cache server sends every page as a pickled requests.Response. it is only
+unpickled the first time the response is read (raw_response, content or
+headers), and the pickle is dropped then, so a Response holds the body once:
+either still pickled or in the requests.Response. content and headers are the
+ones of raw_response, not copies. pickling a Response (to a parser process,
+see crawler/pipeline.py) sends whichever of the two it holds
+'''
+
+
 class Response(object):
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        # set by download when the host failed and the url should be tried again later
+        self.retry_after = None
+        # set by download when the host stopped responding, the url should be
+        # left for the next run
+        self.host_dead = False
+        # pickled requests.Response, until raw_response unpickles it
+        self._pickled = resp_dict.get("response")
+        self._raw_response = None
+
+    # the cache server dict this response was built from
+    def to_dict(self):
+        resp_dict = {"url": self.url, "status": self.status}
+        if self.error is not None:
+            resp_dict["error"] = self.error
+        if self._pickled is not None:
+            resp_dict["response"] = self._pickled
+        elif self._raw_response is not None:
+            resp_dict["response"] = pickle.dumps(self._raw_response)
+        return resp_dict
+
+    @property
+    def raw_response(self):
+        if self._pickled is not None:
+            try:
+                self._raw_response = pickle.loads(self._pickled)
+            except TypeError:
+                self._raw_response = None
+            self._pickled = None
+        return self._raw_response
+
+    # body bytes of the page, None when there is no response
+    @property
+    def content(self):
+        raw_response = self.raw_response
+        return None if raw_response is None else raw_response.content
+
+    @property
+    def headers(self):
+        raw_response = self.raw_response
+        return CaseInsensitiveDict() if raw_response is None else raw_response.headers